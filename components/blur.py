@@ -1,17 +1,35 @@
 from enum import Enum
 import os
 
-from typing import Callable, Tuple
-from PyQt6.QtCore import QPoint, QPointF, QRect, Qt
-from PyQt6.QtGui import QColor, QIcon, QMouseEvent, QPainter, QPixmap
-from PyQt6.QtWidgets import QPushButton
+from typing import Callable, List, Tuple
+from PyQt6.QtCore import QPoint, QPointF, QRect, QRectF, QSizeF, Qt
+from PyQt6.QtGui import (
+    QActionGroup,
+    QColor,
+    QContextMenuEvent,
+    QIcon,
+    QImage,
+    QMouseEvent,
+    QPainter,
+    QPixmap,
+)
+from PyQt6.QtWidgets import QMenu, QPushButton
 
 from components.shortcut_blocking import ShortcutBlockable
 from components.utils import set_cross_cursor, set_normal_cursor
-from functionalities.blur import apply_blur_effect
+from functionalities.blur import (
+    DEFAULT_BLUR_RADIUS,
+    BlurMode,
+    BlurRegion,
+    BlurShape,
+    apply_blur_effect,
+    apply_blur_effects,
+)
 from preload import ICON_DIR
 
 BLUR_ICON = os.path.join(ICON_DIR, "blur.svg")
+# A blurred selection shown above the displayed image, placed in the coordinates of the pixmap
+SelectionPreview = Tuple[QImage, QRectF]
 
 
 class MouseState(Enum):
@@ -27,6 +45,8 @@ class Blur(QPushButton, ShortcutBlockable):
         update_pixmap: Callable[[QPixmap], None],
         map_to_pixmap: Callable[[QPointF | QPoint], Tuple[float, float] | None],
         push_pixmap: Callable[[QPixmap], None],
+        receive_displayed_image: Callable[[], Tuple[QImage, float] | None],
+        show_previews: Callable[[List[Tuple[QImage, QRectF]]], None],
     ) -> None:
         super().__init__(QIcon(BLUR_ICON), "")
         self.setToolTip("Blur")
@@ -38,6 +58,8 @@ class Blur(QPushButton, ShortcutBlockable):
         self.__check_bound = check_bound
         self.__update_pixmap = update_pixmap
         self.__map_to_pixmap = map_to_pixmap
+        self.__receive_displayed_image = receive_displayed_image
+        self.__show_previews = show_previews
 
         self.__is_last_in_bound = False
         self.__is_active = False
@@ -45,12 +67,84 @@ class Blur(QPushButton, ShortcutBlockable):
         self.__selection_start: QPoint = QPoint()
         self.__selection_end: QPoint = QPoint()
         self.__original_pixmap: QPixmap | None = None
+        # The image as displayed, scaled down, the selection is previewed on it while it is dragged
+        self.__displayed_image: QImage | None = None
+        self.__display_scale = 1.0
         self.__selection_rect: QRect = QRect()
-        self.__modified_pixmap: QPixmap | None = None
+        self.__selection_preview: SelectionPreview | None = None
         self.__push_pixmap = push_pixmap
+        self.__blur_mode = BlurMode.MOSAIC
+        self.__blur_shape = BlurShape.RECTANGLE
+        # In batch mode the selections are queued, and blurred all at once by apply_batch()
+        self.__batch_mode = False
+        # Each queued selection with its preview, None when it was out of the displayed image
+        self.__queued_regions: List[Tuple[BlurRegion, SelectionPreview | None]] = []
+        self.__options_menu = self.__create_options_menu()
 
         self.clicked.connect(self.toggle)
 
+    def set_blur_mode(self, blur_mode: BlurMode) -> None:
+        """
+        Change how the selections are blurred.
+        :param blur_mode: the new blur mode
+        :type blur_mode: BlurMode
+        :return: None
+        """
+        self.__blur_mode = blur_mode
+
+    def set_blur_shape(self, blur_shape: BlurShape) -> None:
+        """
+        Change the shape blurred within the selections.
+        :param blur_shape: the new blur shape
+        :type blur_shape: BlurShape
+        :return: None
+        """
+        self.__blur_shape = blur_shape
+
+    def set_batch_mode(self, batch_mode: bool) -> None:
+        """
+        Queue the selections instead of blurring them one by one. Leaving batch mode blurs the queued selections.
+        :param batch_mode: whether to queue the selections
+        :type batch_mode: bool
+        :return: None
+        """
+        self.__batch_mode = batch_mode
+        self.__batch_mode_action.setChecked(batch_mode)
+        if not batch_mode:
+            self.apply_batch()
+
+    def apply_batch(self) -> None:
+        """
+        Blur the queued selections, in a single pass over the image and a single history entry.
+        :return: None
+        """
+        if not self.__queued_regions:
+            return
+
+        self.__apply_regions([region for region, _ in self.__queued_regions])
+        self.__queued_regions = []
+        self.__show_previews([])
+
+    def undo_queued_region(self) -> bool:
+        """
+        Drop the last queued selection.
+        :return: True if there was one
+        :rtype: bool
+        """
+        if not self.__queued_regions:
+            return False
+
+        self.__queued_regions.pop()
+        self.__show_previews(self.__queued_previews())
+        return True
+
+    def __queued_previews(self) -> List[SelectionPreview]:
+        return [preview for _, preview in self.__queued_regions if preview is not None]
+
+    def contextMenuEvent(self, a0: QContextMenuEvent | None) -> None:
+        assert a0 is not None
+        self.__options_menu.exec(a0.globalPos())
+
     def deactivate(self) -> None:
         """
         Deactivate the blur button.
@@ -60,6 +154,7 @@ class Blur(QPushButton, ShortcutBlockable):
         self.setChecked(False)
         self.__mouse_state = MouseState.NORMAL
         set_normal_cursor()
+        self.apply_batch()
 
     def activate(self) -> None:
         """
@@ -117,7 +212,10 @@ class Blur(QPushButton, ShortcutBlockable):
         if self.__original_pixmap is None:
             return
 
-        self.__original_pixmap = self.__original_pixmap.copy()
+        displayed_image = self.__receive_displayed_image()
+        if displayed_image is not None:
+            self.__displayed_image, self.__display_scale = displayed_image
+
         start_pos = self.__map_to_pixmap(a0.globalPosition())
         if start_pos is not None:
             start_pos = QPointF(*start_pos)
@@ -138,23 +236,36 @@ class Blur(QPushButton, ShortcutBlockable):
         self.__mouse_state = MouseState.NORMAL
         self.unblock()
 
-        if self.__selection_rect.isNull():
-            return
-
-        pixmap = self.__original_pixmap
-        assert pixmap is not None
-        img = pixmap.toImage()
-
-        blured_img = apply_blur_effect(img, self.__selection_rect)
-        self.__modified_pixmap = QPixmap.fromImage(blured_img)
-        self.__update_pixmap(self.__modified_pixmap)
-        self.__push_pixmap(self.__modified_pixmap)
-
+        region = BlurRegion(self.__selection_rect, self.__blur_mode, self.__blur_shape)
+        selection_preview = self.__selection_preview
         self.__selection_start = QPoint()
         self.__selection_end = QPoint()
         self.__original_pixmap = None
+        self.__displayed_image = None
         self.__selection_rect = QRect()
-        self.__modified_pixmap = None
+        self.__selection_preview = None
+
+        if region.rect.isNull():
+            self.__show_previews(self.__queued_previews())
+            return
+
+        if self.__batch_mode:
+            self.__queued_regions.append((region, selection_preview))
+            self.__show_previews(self.__queued_previews())
+            return
+
+        self.__show_previews([])
+        self.__apply_regions([region])
+
+    def __apply_regions(self, regions: List[BlurRegion]) -> None:
+        pixmap = self.__receive_pixmap()
+        if pixmap is None:
+            return
+
+        img = apply_blur_effects(pixmap.toImage(), regions)
+        modified_pixmap = QPixmap.fromImage(img)
+        self.__update_pixmap(modified_pixmap)
+        self.__push_pixmap(modified_pixmap)
 
     def __update_mouse_ui(self, a0: QMouseEvent) -> None:
         mouse_glob_pos = a0.globalPosition()
@@ -186,13 +297,94 @@ class Blur(QPushButton, ShortcutBlockable):
             self.__selection_start, self.__selection_end
         ).normalized()
 
-        pixmap = self.__original_pixmap.copy()
-        painter = QPainter(pixmap)
+        self.__preview_selection()
+
+    def __preview_selection(self) -> None:
+        """
+        Show the blurred selection above the displayed image, computed at the display resolution. The full resolution
+        image is only blurred on release.
+        :return: None
+        """
+        if self.__displayed_image is None:
+            return
+
+        scale = self.__display_scale
+        rect = QRectF(
+            QPointF(self.__selection_rect.topLeft()) * scale,
+            QSizeF(self.__selection_rect.size()) * scale,
+        ).toAlignedRect()
+        rect = rect.intersected(self.__displayed_image.rect())
+        if rect.isEmpty():
+            self.__selection_preview = None
+            self.__show_previews(self.__queued_previews())
+            return
+
+        preview = self.__displayed_image.copy(rect)
+        apply_blur_effect(
+            preview,
+            preview.rect(),
+            self.__blur_mode,
+            self.__blur_shape,
+            max(1, round(DEFAULT_BLUR_RADIUS * scale)),
+        )
+
+        painter = QPainter(preview)
         painter.setPen(QColor(255, 255, 255))
         painter.setBrush(
             Qt.BrushStyle.NoBrush
         )  # No fill for the rectangle (transparent inside)
-        painter.drawRect(self.__selection_rect)
+        outline = preview.rect().adjusted(0, 0, -1, -1)
+        if self.__blur_shape == BlurShape.ELLIPSE:
+            painter.drawEllipse(outline)
+        else:
+            painter.drawRect(outline)
         painter.end()
 
-        self.__update_pixmap(pixmap)
+        # Placed in the coordinates of the original pixmap, so it follows the zoom
+        self.__selection_preview = (
+            preview,
+            QRectF(QPointF(rect.topLeft()) / scale, QSizeF(rect.size()) / scale),
+        )
+        self.__show_previews(self.__queued_previews() + [self.__selection_preview])
+
+    def __create_options_menu(self) -> QMenu:
+        """
+        Create the menu choosing the blur mode and shape, opened by a right click on the button.
+        :return: the menu
+        :rtype: QtWidgets.QMenu
+        """
+        menu = QMenu(self)
+
+        mode_group = QActionGroup(menu)
+        for mode in (BlurMode.MOSAIC, BlurMode.PIXELATE, BlurMode.GAUSSIAN):
+            action = menu.addAction(mode.name.capitalize())
+            assert action is not None
+            action.setCheckable(True)
+            action.setChecked(mode == self.__blur_mode)
+            action.triggered.connect(lambda _, mode=mode: self.set_blur_mode(mode))
+            mode_group.addAction(action)
+
+        menu.addSeparator()
+
+        shape_group = QActionGroup(menu)
+        for shape in (BlurShape.RECTANGLE, BlurShape.ELLIPSE):
+            action = menu.addAction(shape.name.capitalize())
+            assert action is not None
+            action.setCheckable(True)
+            action.setChecked(shape == self.__blur_shape)
+            action.triggered.connect(lambda _, shape=shape: self.set_blur_shape(shape))
+            shape_group.addAction(action)
+
+        menu.addSeparator()
+
+        batch_mode_action = menu.addAction("Batch")
+        assert batch_mode_action is not None
+        batch_mode_action.setCheckable(True)
+        batch_mode_action.triggered.connect(self.set_batch_mode)
+        self.__batch_mode_action = batch_mode_action
+
+        apply_batch_action = menu.addAction("Apply batch")
+        assert apply_batch_action is not None
+        apply_batch_action.triggered.connect(self.apply_batch)
+
+        return menu
@@ -5,7 +5,6 @@ from typing import Callable, Optional, Tuple
 from PyQt6 import QtGui
 from PyQt6.QtCore import QPoint, QRect, QSize, Qt
 from PyQt6.QtGui import (
-    QBrush,
     QColor,
     QIcon,
     QPaintEvent,
@@ -81,6 +80,7 @@ class SnapshotOverlay(QWidget):
         set_cross_cursor()
 
         self.__screen_pixmap = capture_all_screens_mss()
+        self.__dimmed_pixmap = self.__create_dimmed_pixmap(self.__screen_pixmap)
         self.__selection_start = QPoint()
         self.__selection_rect = QRect()
         self.__capture_mode = CaptureMode.SCREEN
@@ -89,21 +89,38 @@ class SnapshotOverlay(QWidget):
         self.showFullScreen()
 
     def paintEvent(self, a0: Optional[QPaintEvent]) -> None:
+        assert a0 is not None
         painter = QPainter(self)
 
-        # Draw the frozen screen as background
-        painter.drawPixmap(self.rect(), self.__screen_pixmap)
-
-        # Draw the darkened overlay
-        painter.setBrush(QBrush(QColor(0, 0, 0, 150)))  # Semi-transparent black
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.drawRect(self.rect())
+        # Only repaint the invalidated part, the background is already darkened
+        dirty_rect = a0.rect()
+        painter.drawPixmap(dirty_rect, self.__dimmed_pixmap, dirty_rect)
 
         # Draw the selection area (revealing the original screen content)
-        if not self.__selection_rect.isNull():
-            painter.drawPixmap(
-                self.__selection_rect, self.__screen_pixmap, self.__selection_rect
-            )
+        selection_rect = self.__selection_rect.intersected(dirty_rect)
+        if not selection_rect.isEmpty():
+            painter.drawPixmap(selection_rect, self.__screen_pixmap, selection_rect)
+
+    @staticmethod
+    def __create_dimmed_pixmap(screen_pixmap: QPixmap) -> QPixmap:
+        """
+        Create the frozen screen with the darkened overlay already applied, so it is composed once instead of on
+        every paint.
+
+        :param screen_pixmap: The frozen screen
+        :type screen_pixmap: QPixmap
+        :return: The darkened screen
+        :rtype: QPixmap
+        """
+        dimmed_pixmap = screen_pixmap.copy()
+
+        painter = QPainter(dimmed_pixmap)
+        painter.fillRect(
+            dimmed_pixmap.rect(), QColor(0, 0, 0, 150)
+        )  # Semi-transparent black
+        painter.end()
+
+        return dimmed_pixmap
 
     def keyPressEvent(self, a0: Optional[QtGui.QKeyEvent]) -> None:
         self.close()
@@ -129,10 +146,13 @@ class SnapshotOverlay(QWidget):
         if not self.__selection_start.isNull():
             self.__capture_mode = CaptureMode.AREA
             # Update the selection rectangle based on mouse position
+            previous_rect = self.__selection_rect
             self.__selection_rect = QRect(
                 self.__selection_start, a0.globalPosition().toPoint()
             ).normalized()
-            self.update()
+
+            # Only the area covered by the old or the new selection has changed
+            self.update(previous_rect.united(self.__selection_rect))
 
     def mouseReleaseEvent(self, a0: Optional[QtGui.QMouseEvent]) -> None:
         assert a0 is not None
@@ -1,9 +1,16 @@
 from enum import Enum
 import time
 from os import error
-from typing import Callable, Optional, Tuple
-from PyQt6.QtCore import QPoint, QPointF, Qt
-from PyQt6.QtGui import QImage, QPixmap, QResizeEvent, QWheelEvent
+from typing import Callable, List, Optional, Tuple
+from PyQt6.QtCore import QPoint, QPointF, QRect, QRectF, Qt
+from PyQt6.QtGui import (
+    QImage,
+    QPainter,
+    QPaintEvent,
+    QPixmap,
+    QResizeEvent,
+    QWheelEvent,
+)
 from PyQt6.QtWidgets import (
     QFrame,
     QLabel,
@@ -112,6 +119,23 @@ class ImageViewer(QWidget):
         """
         self.label.setPixmap(a0)
 
+    def get_displayed_image(self) -> Tuple[QImage, float] | None:
+        """
+        Get the image as it is displayed, scaled and zoomed.
+        :return: the displayed image and its scale relative to the original pixmap
+        :rtype: Tuple[QImage, float] or None
+        """
+        return self.label.get_displayed_image()
+
+    def set_previews(self, previews: List[Tuple[QImage, QRectF]]) -> None:
+        """
+        Show images above parts of the displayed image, without changing the pixmap.
+        :param previews: the images and where to show them, in the coordinates of the original pixmap
+        :type previews: List[Tuple[QImage, QRectF]]
+        :return: None
+        """
+        self.label.set_previews(previews)
+
     def __on_wheel_event(self, a0: Optional[QWheelEvent]) -> None:
         if a0 is None:
             raise error("wheelEvent should not be None")
@@ -204,6 +228,48 @@ class ImageLabel(QLabel):
         self.__max_zoom = 5  # 500%
         self.__min_zoom = 0.1  # 10%
         self.__zoom_delta = 0.1  # 10%
+        self.__preview_overlay = PreviewOverlay(self)
+
+    def resizeEvent(self, a0: Optional[QResizeEvent]) -> None:
+        super().resizeEvent(a0)
+        self.__preview_overlay.resize(self.size())
+
+    def get_displayed_image(self) -> Tuple[QImage, float] | None:
+        """
+        Return the image as it is displayed, scaled and zoomed.
+        :return: the displayed image and its scale relative to the original pixmap (if existed)
+        :rtype: Tuple[QImage, float] or None
+        """
+        if self.__original_pixmap is None:
+            return None
+
+        return self.pixmap().toImage(), self.scale_factor * self.__zoom_factor
+
+    def set_previews(self, previews: List[Tuple[QImage, QRectF]]) -> None:
+        """
+        Show images above parts of the displayed image, without rescaling the pixmap. They follow the zoom.
+        :param previews: the images and where to show them, in the coordinates of the original pixmap
+        :type previews: List[Tuple[QImage, QRectF]]
+        :return: None
+        """
+        self.__preview_overlay.set_previews(previews)
+
+    def map_from_original_pixmap(self, rect: QRectF) -> QRectF:
+        """
+        Map a rectangle of the original pixmap to the label.
+        :param rect: the rectangle, in the coordinates of the original pixmap
+        :type rect: QRectF
+        :return: where it is displayed in the label
+        :rtype: QRectF
+        """
+        scale = self.scale_factor * self.__zoom_factor
+
+        # The displayed image is centered in the label
+        pixmap_offset = QPointF(
+            (self.width() - self.pixmap().width()) / 2,
+            (self.height() - self.pixmap().height()) / 2,
+        )
+        return QRectF(rect.topLeft() * scale + pixmap_offset, rect.size() * scale)
 
     def get_image(self) -> QImage | None:
         """
@@ -361,6 +427,48 @@ class ImageLabel(QLabel):
         return x >= 0 and x < w and y >= 0 and y < h
 
 
+class PreviewOverlay(QWidget):
+    """
+    A transparent layer above the image label, showing previews of edits while they are being made.
+
+    Only the parts of the label under the previews are repainted when they change, the pixmap is not rescaled.
+    """
+
+    def __init__(self, parent: ImageLabel) -> None:
+        super().__init__(parent)
+
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.__label = parent
+        self.__previews: List[Tuple[QImage, QRectF]] = []
+
+    def set_previews(self, previews: List[Tuple[QImage, QRectF]]) -> None:
+        """
+        Show images at places of the original pixmap, replacing the previous ones.
+        :param previews: the images and where to show them, in the coordinates of the original pixmap
+        :type previews: List[Tuple[QImage, QRectF]]
+        :return: None
+        """
+        dirty_rect = self.__displayed_rect()
+        self.__previews = previews
+        self.update(dirty_rect.united(self.__displayed_rect()))
+
+    def paintEvent(self, a0: Optional[QPaintEvent]) -> None:
+        if not self.__previews:
+            return
+
+        painter = QPainter(self)
+        for image, rect in self.__previews:
+            painter.drawImage(self.__label.map_from_original_pixmap(rect), image)
+        painter.end()
+
+    def __displayed_rect(self) -> QRect:
+        rect = QRectF()
+        for _, preview_rect in self.__previews:
+            rect = rect.united(self.__label.map_from_original_pixmap(preview_rect))
+
+        return rect.toAlignedRect()
+
+
 class ScrollArea(QScrollArea):
     def __init__(self, parent: QWidget, on_wheel_event: Callable[..., None]) -> None:
         super().__init__(parent)
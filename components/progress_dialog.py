@@ -0,0 +1,102 @@
+from typing import Callable
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QCloseEvent, QFont
+from PyQt6.QtWidgets import QDialog, QLabel, QProgressBar, QPushButton, QVBoxLayout
+
+
+class ProgressDialog(QDialog):
+    """
+    Non-blocking dialog showing the progress of a background job, which the user can cancel.
+    """
+
+    def __init__(self, title: str, on_cancel: Callable[[], None], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setFixedSize(400, 160)
+        self.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint)
+        self.setStyleSheet(
+            """
+            QDialog {
+                background-color: #2e3440;  /* Dark theme background */
+                border: 1px solid #4c566a; /* Subtle border */
+                border-radius: 10px;
+            }
+            QLabel {
+                color: #d8dee9;           /* Text color */
+            }
+            QProgressBar {
+                background-color: #3b4252;
+                color: #eceff4;
+                border: 1px solid #4c566a;
+                border-radius: 5px;
+                text-align: center;
+            }
+            QProgressBar::chunk {
+                background-color: #88c0d0;
+                border-radius: 5px;
+            }
+            QPushButton {
+                background-color: #4c566a; /* Button background */
+                color: #eceff4;           /* Button text */
+                border: 1px solid #5e81ac;
+                border-radius: 5px;
+                padding: 5px 10px;
+            }
+            QPushButton:hover {
+                background-color: #5e81ac; /* Hover effect */
+            }
+        """
+        )
+        self.__on_cancel = on_cancel
+        self.__finished = False
+        self.init_ui(title)
+
+    def init_ui(self, title: str):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        self.__message_label = QLabel(title)
+        self.__message_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        font = QFont("Arial", 12)
+        font.setBold(True)
+        self.__message_label.setFont(font)
+        layout.addWidget(self.__message_label)
+
+        # Busy indicator until the first progress report comes in
+        self.__progress_bar = QProgressBar()
+        self.__progress_bar.setRange(0, 0)
+        layout.addWidget(self.__progress_bar)
+
+        self.__cancel_button = QPushButton("Cancel")
+        self.__cancel_button.clicked.connect(self.__cancel)
+        self.__cancel_button.setFixedWidth(80)
+        self.__cancel_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        layout.addWidget(self.__cancel_button, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        self.setLayout(layout)
+
+    def set_progress(self, progress: float) -> None:
+        """
+        Update the progress bar.
+
+        :param float progress: The fraction of the job that is done, between 0 and 1
+        :return: None
+        """
+        self.__progress_bar.setRange(0, 100)
+        self.__progress_bar.setValue(round(max(0.0, min(1.0, progress)) * 100))
+
+    def finish(self) -> None:
+        """Close the dialog once the job is over, without cancelling it."""
+        self.__finished = True
+        self.close()
+
+    def closeEvent(self, a0: QCloseEvent | None) -> None:
+        # Closing the window while the job is running is the same as cancelling it
+        if not self.__finished:
+            self.__cancel()
+        super().closeEvent(a0)
+
+    def __cancel(self) -> None:
+        self.__cancel_button.setEnabled(False)
+        self.__message_label.setText("Cancelling...")
+        self.__on_cancel()
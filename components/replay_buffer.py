@@ -0,0 +1,163 @@
+import asyncio
+import csv
+import math
+import os
+import platform
+import shutil
+import subprocess
+from typing import List
+import ffmpeg
+from PyQt6.QtCore import QRect, QThread, pyqtSignal
+
+from components.video_recorder import (
+    REPLAY_SEGMENT_LIST,
+    REPLAY_SEGMENT_SECONDS,
+    BackpressurePolicy,
+    RecordingWorker,
+    RecordingWorkerPool,
+    ScreenRecorder,
+    VideoType,
+)
+from functionalities.video_processing import (
+    concat_segments_ffmpeg_python,
+    concat_segments_ffmpeg_raw_command,
+)
+from preload import TEMP_DIR
+
+REPLAY_DIR = os.path.join(TEMP_DIR, "replay")
+# How much of the past a replay buffer keeps by default
+REPLAY_SECONDS = 30
+REPLAY_FPS = 30.0
+# A replay has no audio
+REPLAY_WORKERS = (RecordingWorker.CAPTURE, RecordingWorker.WRITER)
+
+
+class ReplayBuffer:
+    """
+    Keeps recording an area of the screen into a rolling ring of short video segments on disk, so the last seconds
+    can be saved after the fact.
+
+    Disk usage is bounded by the ring, CPU by the frame rate, and saving only joins the latest segments without
+    re-encoding them. There is no audio. The buffer needs its own capture and writer workers, so a normal recording can
+    run at the same time.
+    """
+
+    def __init__(
+        self,
+        worker_pool: RecordingWorkerPool,
+        seconds: float = REPLAY_SECONDS,
+        fps: float = REPLAY_FPS,
+    ) -> None:
+        """
+        :param RecordingWorkerPool worker_pool: Started workers of REPLAY_WORKERS, not shared with other recordings
+        :param float seconds: How many seconds of the past are kept
+        :param float fps: The frame rate of the replay, at most the one the pool was sized for
+        """
+        self.seconds = seconds
+        self.__fps = fps
+        self.__worker_pool = worker_pool
+        self.__screen_recorder: ScreenRecorder | None = None
+
+    def is_running(self) -> bool:
+        return self.__screen_recorder is not None
+
+    def start(self, capture_area: QRect) -> None:
+        """
+        Start keeping the last seconds of an area of the screen.
+
+        :param QRect capture_area: The area to record
+        :return: None
+        """
+        if self.__screen_recorder is not None:
+            return
+
+        shutil.rmtree(REPLAY_DIR, ignore_errors=True)
+        os.makedirs(REPLAY_DIR)
+
+        self.__screen_recorder = ScreenRecorder(
+            self.__worker_pool,
+            capture_area,
+            REPLAY_DIR,
+            self.__fps,
+            VideoType.REPLAY,
+            BackpressurePolicy.DROP_OLDEST,  # stay close to real time
+            replay_seconds=self.seconds,
+        )
+        asyncio.run(self.__screen_recorder.start())
+        print(f"Replay buffer started, keeping the last {self.seconds} seconds")
+
+    def stop(self) -> None:
+        """Stop recording, the segments are dropped at the next start."""
+        if self.__screen_recorder is None:
+            return
+
+        asyncio.run(self.__screen_recorder.stop())
+        self.__screen_recorder = None
+        print("Replay buffer stopped")
+
+    def latest_segments(self) -> List[str]:
+        """
+        Return the segments covering the last seconds, the one being written included.
+
+        :return: The paths of the segment files, oldest first
+        :rtype: List[str]
+        """
+        if not os.path.isdir(REPLAY_DIR):
+            return []
+
+        segments = []
+        list_file = os.path.join(REPLAY_DIR, REPLAY_SEGMENT_LIST)
+        if os.path.isfile(list_file):
+            with open(list_file, newline="") as f:
+                segments = [
+                    os.path.join(REPLAY_DIR, row[0]) for row in csv.reader(f) if row
+                ]
+
+        # The segment being written is the newest file, it is not listed until it is finished
+        files = [
+            os.path.join(REPLAY_DIR, name)
+            for name in os.listdir(REPLAY_DIR)
+            if name.endswith(".mkv")
+        ]
+        if files:
+            # Once the ring wraps, its file may still be listed from the previous round
+            newest = max(files, key=os.path.getmtime)
+            segments = [segment for segment in segments if segment != newest]
+            segments.append(newest)
+
+        segments = [segment for segment in segments if os.path.isfile(segment)]
+        count = math.ceil(self.seconds / REPLAY_SEGMENT_SECONDS) + 1
+        return segments[-count:]
+
+    def save(self, output_file: str) -> None:
+        """
+        Save the last seconds to a video file, without stopping the buffer.
+
+        :param str output_file: The MP4 file to write
+        :return: None
+        :raises FileNotFoundError: if nothing has been recorded yet
+        """
+        segments = self.latest_segments()
+        if platform.system() == "Windows":
+            concat_segments_ffmpeg_raw_command(segments, output_file)
+        else:
+            concat_segments_ffmpeg_python(segments, output_file)
+
+
+class ReplaySaver(QThread):
+    replay_saved = pyqtSignal(str)
+    replay_saving_error = pyqtSignal(str)
+
+    def __init__(self, replay_buffer: ReplayBuffer, output_file: str):
+        super().__init__()
+        self.__replay_buffer = replay_buffer
+        self.__output_file = output_file
+
+    def run(self) -> None:
+        try:
+            self.__replay_buffer.save(self.__output_file)
+        except (OSError, subprocess.CalledProcessError, ffmpeg.Error) as e:
+            self.replay_saving_error.emit(str(e))
+            return
+
+        self.replay_saved.emit(self.__output_file)
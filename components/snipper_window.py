@@ -1,6 +1,7 @@
+import threading
 import time
 from typing import Callable, List, Optional, Tuple
-from PyQt6.QtCore import QRect, Qt
+from PyQt6.QtCore import QMetaObject, QRect, Qt, pyqtSlot
 from PyQt6.QtGui import QColor, QKeySequence, QPixmap, QResizeEvent, QShortcut
 from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
 from components.blur import Blur
@@ -10,7 +11,7 @@ from components.save import SaveButton
 from components.shortcut_blocking import ShortcutBlockable
 from components.upload import ResourceType, UploadButton, UploadResource
 from components.zoom import Zoom
-from preload import BECAP_CLIPBOARD_MANAGER_PATH, APP_NAME
+from preload import BECAP_CLIPBOARD_MANAGER_PATH, BECAP_VIDEO_PATH, APP_NAME, env
 import os
 
 from components.mouse_observer import MouseObserver
@@ -18,7 +19,20 @@ from components.color_picker import ColorPicker
 from components.capture import NewCapture
 from components.toolbar import MiddleToolBar, TopToolBar, BottomToolBar
 from components.mode_switching import ModeSwitching
-from components.video_recorder import VideoRecorder
+from components.video_recorder import (
+    RecordingWorkerPool,
+    VideoRecorder,
+    recover_orphaned_recordings,
+)
+from components.replay_buffer import (
+    REPLAY_FPS,
+    REPLAY_WORKERS,
+    ReplayBuffer,
+    ReplaySaver,
+)
+from components.message_dialog import CustomCriticalDialog, CustomInformationDialog
+from components import utils
+from pynput import keyboard
 from components.viewer import Viewer, Mode
 from utils.styles import styles
 
@@ -62,10 +76,17 @@ class PixmapHistory:
 
 
 class SnipperWindow(QMainWindow):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        recording_worker_pool: RecordingWorkerPool,
+        replay_worker_pool: RecordingWorkerPool,
+    ) -> None:
         super().__init__()
 
         self.setWindowTitle(APP_NAME)
+        self.__recording_worker_pool = recording_worker_pool
+        self.__replay_buffer = ReplayBuffer(replay_worker_pool)
+        self.__replay_saver: ReplaySaver | None = None
 
         self.setFixedSize(450, 100)
         self.is_expand_before = False
@@ -215,6 +236,8 @@ class SnipperWindow(QMainWindow):
             self.__viewer.set_pixmap,
             self.__viewer.get_original_pixmap_coords_from_global,
             self.__add_to_pixmap_history,
+            self.__viewer.get_displayed_image,
+            self.__viewer.set_previews,
         )
         self.__painter = Painter(
             self.__viewer.toggle_palette,
@@ -245,12 +268,14 @@ class SnipperWindow(QMainWindow):
         if not self.__save_btn.isEnabled():
             return
 
+        self.__blur_btn.apply_batch()
         self.__viewer.save()
 
     def __on_copy_event(self) -> None:
         if not self.__copy_btn.isEnabled():
             return
 
+        self.__blur_btn.apply_batch()
         pixmap = self.__viewer.get_pixmap()
         if pixmap is None:
             return
@@ -305,11 +330,18 @@ class SnipperWindow(QMainWindow):
             self.__viewer.set_mode(Mode.VIDEO)
 
             self.__video_recorder = VideoRecorder(
-                capture_area, self.__on_post_video_recording_event
+                capture_area,
+                self.__on_post_video_recording_event,
+                self.__recording_worker_pool,
+                show_telemetry=env == "dev",
             )
             self.__video_recorder.start_recording()
 
-    def __on_post_video_recording_event(self) -> None:
+    def __on_post_video_recording_event(self, saved: bool) -> None:
+        if not saved:
+            self.show()
+            return
+
         self.__viewer.set_video(self.__video_recorder.video_file_path)
         self.__show_with_expand()
 
@@ -321,6 +353,8 @@ class SnipperWindow(QMainWindow):
         shortcut.activated.connect(self.close)
         shortcut = QShortcut(QKeySequence("Tab"), self)
         shortcut.activated.connect(self.__on_switch_mode_shortcut_action)
+        shortcut = QShortcut(QKeySequence("Ctrl+R"), self)
+        shortcut.activated.connect(self.__on_toggle_replay_buffer_action)
 
         # Cannot be used when being blocked
         shortcut = QShortcut(QKeySequence("Ctrl+S"), self)
@@ -340,6 +374,49 @@ class SnipperWindow(QMainWindow):
         shortcut = QShortcut(QKeySequence("Ctrl+D"), self)
         shortcut.activated.connect(self.__on_paint_action)
 
+    def __on_toggle_replay_buffer_action(self) -> None:
+        if self.__replay_buffer.is_running():
+            self.__replay_buffer.stop()
+            self.setWindowTitle(APP_NAME)
+            return
+
+        self.__replay_buffer.start(utils.get_focus_screen_geometry())
+        self.setWindowTitle(f"{APP_NAME} (replay buffer on)")
+
+    @pyqtSlot()
+    def save_replay(self) -> None:
+        """Save the last seconds kept by the replay buffer to the video folder."""
+        if not self.__replay_buffer.is_running():
+            print("The replay buffer is off, press Ctrl+R to turn it on")
+            return
+        if self.__replay_saver is not None and self.__replay_saver.isRunning():
+            return
+
+        saved_time = time.strftime("%Y%m%d%H%M%S")
+        video_path = os.path.join(BECAP_VIDEO_PATH, f"becap_replay_{saved_time}.mp4")
+
+        self.__replay_saver = ReplaySaver(self.__replay_buffer, video_path)
+        self.__replay_saver.replay_saved.connect(self.__on_replay_saved)
+        self.__replay_saver.replay_saving_error.connect(self.__on_replay_saving_error)
+        self.__replay_saver.start()
+
+    def __on_replay_saved(self, video_path: str) -> None:
+        print(f"Replay saved to {video_path}")
+        self.__replay_saved_dialog = CustomInformationDialog(
+            "Replay saved",
+            f"The last {self.__replay_buffer.seconds} seconds were saved to {video_path}",
+            self,
+        )
+        self.__replay_saved_dialog.show()
+
+    def __on_replay_saving_error(self, message: str) -> None:
+        CustomCriticalDialog(
+            "Error", f"Failed to save the replay: {message}", self
+        ).exec()
+
+    def close_replay_buffer(self) -> None:
+        self.__replay_buffer.stop()
+
     def __can_shortcut(self) -> bool:
         return all(
             not shortcut.is_blocking() for shortcut in self.__shortcut_blockable_list
@@ -391,6 +468,9 @@ class SnipperWindow(QMainWindow):
         if not self.__can_shortcut():
             return
 
+        if self.__blur_btn.undo_queued_region():
+            return
+
         pixmap = self.__pixmap_history.undo()
         if pixmap is not None:
             self.__viewer.set_pixmap(pixmap)
@@ -431,9 +511,18 @@ def run_snipper_window():
     import sys
     from PyQt6.QtWidgets import QApplication
 
+    # Started before Qt, so the workers are forked from a process without its threads
+    recording_worker_pool = RecordingWorkerPool()
+    recording_worker_pool.start()
+    replay_worker_pool = RecordingWorkerPool(REPLAY_FPS, REPLAY_WORKERS)
+    replay_worker_pool.start()
+
+    # Recordings interrupted by a crash are saved in the background
+    threading.Thread(target=recover_orphaned_recordings, daemon=True).start()
+
     app = QApplication(sys.argv)
     app.setStyleSheet(styles)
-    w = SnipperWindow()
+    w = SnipperWindow(recording_worker_pool, replay_worker_pool)
     w.show()
 
     window = w.window()
@@ -445,4 +534,15 @@ def run_snipper_window():
     mouse_observer = MouseObserver(window_handle)
     mouse_observer.subcribe(w.subscribers())
 
-    app.exec()
+    def on_save_replay():
+        QMetaObject.invokeMethod(w, "save_replay", Qt.ConnectionType.QueuedConnection)
+
+    # Saving the replay must work while another app has the focus
+    with keyboard.GlobalHotKeys(
+        {"<ctrl>+<alt>+r": on_save_replay},
+    ):
+        app.exec()
+
+    w.close_replay_buffer()
+    replay_worker_pool.shutdown()
+    recording_worker_pool.shutdown()
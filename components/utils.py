@@ -1,4 +1,6 @@
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import List, Tuple
 from PyQt6.QtCore import QRect, QSize, Qt
 from PyQt6.QtGui import QColor, QCursor, QImage, QPainter, QPen, QPixmap
 from PyQt6.QtWidgets import QApplication
@@ -89,35 +91,63 @@ def get_combined_screen_geometry_mss() -> QRect:
 
 
 def capture_all_screens_mss() -> QPixmap:
+    """
+    Capture every screen at once.
+
+    mss hands out BGRA rows, which is exactly the in-memory layout of QImage.Format_RGB32 on little-endian machines,
+    so the screenshot buffer is wrapped as a QImage as is and the only copy made is the upload into the QPixmap.
+
+    :return: The combined screenshot
+    :rtype: QPixmap
+    """
     with mss.mss() as sct:
         combined_monitor = sct.monitors[0]
+        screenshot = sct.grab(combined_monitor)
 
-        screenshot = sct.grab(
-            (
-                combined_monitor["left"],
-                combined_monitor["top"],
-                combined_monitor["width"],
-                combined_monitor["height"],
-            )
-        )
-
-        img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-        img = img.convert("RGBA")
+        # The QImage does not own the buffer, so it must not outlive the screenshot
         img = QImage(
-            img.tobytes("raw", "RGBA"),
-            img.size[0],
-            img.size[1],
-            QImage.Format.Format_RGBA8888,
+            screenshot.raw,
+            screenshot.width,
+            screenshot.height,
+            screenshot.width * 4,
+            QImage.Format.Format_RGB32,
         )
 
         pixmap = QPixmap.fromImage(img)
         return pixmap
 
 
-def capture_mss(rect: QRect) -> MatLike | None:
-    with mss.mss() as sct:
-        # List of monitors
-        combined_monitor = sct.monitors[0]
+class ScreenGrabber:
+    """
+    Long-lived screen grabber bound to a fixed capture area.
+
+    The mss instance (and with it the X display connection and the XShm segment, where available) is opened once and
+    reused for every frame. The monitor list, the intersection of the capture area with the combined screen geometry
+    and the output frame buffer are computed once as well, so a grab only costs the pixel transfer and one color
+    conversion into the reused buffer.
+
+    Frames can be scaled down as they are grabbed, before the color conversion so it has fewer pixels to go through.
+    They can also be kept in the BGRA layout of the screenshot, which saves the conversion altogether.
+
+    An area spanning several monitors is grabbed one monitor at a time, all of them at once on a pool of threads
+    (mss does not hold the GIL while the pixels are transferred), and the parts are stitched into a preallocated
+    frame. Each thread has an mss instance of its own, as they cannot be shared between threads.
+
+    Note that the returned frame is overwritten by the next grab, copy it if it has to outlive that.
+    """
+
+    def __init__(
+        self, rect: QRect, output_size: QSize | None = None, bgra: bool = False
+    ) -> None:
+        """
+        :param QRect rect: The area to grab
+        :param output_size: The size of the frames, the area is scaled to it. The size of the area if None.
+        :type output_size: QSize | None
+        :param bool bgra: Return BGRA frames as grabbed (the alpha byte is unspecified) instead of BGR ones
+        """
+        self.__sct = mss.mss()
+        self.monitors = self.__sct.monitors
+        combined_monitor = self.monitors[0]
 
         # Check if the rect intersects with the screen geometry
         screen_geometry = QRect(
@@ -127,25 +157,192 @@ def capture_mss(rect: QRect) -> MatLike | None:
             combined_monitor["height"],
         )
 
-        if not screen_geometry.intersects(rect):
+        # Calculate the intersection of the QRect with the screen's geometry
+        self.intersection_rect = (
+            rect.intersected(screen_geometry)
+            if screen_geometry.intersects(rect)
+            else QRect()
+        )
+        self.__region = self.__to_region(self.intersection_rect)
+
+        # The part of the area on each physical monitor, with its position in the frame
+        self.__parts: List[Tuple[dict, QRect]] = []
+        for monitor in self.monitors[1:]:
+            part = self.intersection_rect.intersected(
+                QRect(
+                    monitor["left"], monitor["top"], monitor["width"], monitor["height"]
+                )
+            )
+            if not part.isEmpty():
+                self.__parts.append(
+                    (
+                        self.__to_region(part),
+                        part.translated(-self.intersection_rect.topLeft()),
+                    )
+                )
+
+        # Where monitors of different sizes leave holes in the area, there is nothing to grab
+        self.__has_gaps = (
+            sum(rect.width() * rect.height() for _, rect in self.__parts)
+            < self.intersection_rect.width() * self.intersection_rect.height()
+        )
+
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__local = threading.local()
+        self.__thread_scts: List[mss.base.MSSBase] = []
+        if len(self.__parts) > 1:
+            # The calling thread grabs a part itself
+            self.__executor = ThreadPoolExecutor(
+                len(self.__parts) - 1, thread_name_prefix="ScreenGrabber"
+            )
+
+        native_size = self.intersection_rect.size()
+        self.output_size = native_size if output_size is None else QSize(output_size)
+        width, height = self.output_size.width(), self.output_size.height()
+
+        self.__bgra = bgra
+        self.__is_scaled = self.output_size != native_size and not native_size.isEmpty()
+        self.__scaled = None
+        if self.__is_scaled and not bgra:
+            self.__scaled = np.empty((height, width, 4), dtype=np.uint8)
+        self.__frame = np.empty((height, width, 4 if bgra else 3), dtype=np.uint8)
+
+        # Where the parts are stitched, unless they can go straight to the frame. Gaps between monitors stay black.
+        self.__stitched = None
+        if self.__executor is not None and (self.__is_scaled or not bgra):
+            self.__stitched = np.zeros(
+                (native_size.height(), native_size.width(), 4), dtype=np.uint8
+            )
+
+    @staticmethod
+    def __to_region(rect: QRect) -> dict:
+        return {
+            "left": rect.x(),
+            "top": rect.y(),
+            "width": rect.width(),
+            "height": rect.height(),
+        }
+
+    def __enter__(self) -> "ScreenGrabber":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def grab(self, out: MatLike | None = None) -> MatLike | None:
+        """
+        Grab the capture area.
+
+        :param out: Where to write the frame to, the grabber's own buffer if None. Must be a height x width x 3 uint8
+            array (x 4 for BGRA), with the output size
+        :type out: MatLike | None
+        :return: The BGR (or BGRA) frame, or None if the capture area is outside of every screen
+        :rtype: MatLike | None
+        """
+        if self.intersection_rect.isEmpty():
             return None
 
-        # Calculate the intersection of the QRect with the screen's geometry
-        intersection_rect = rect.intersected(screen_geometry)
+        frame = self.__frame if out is None else out
+        if self.__executor is not None:
+            if self.__stitched is None:
+                if self.__has_gaps:
+                    frame[:] = 0
+                self.__grab_parts(frame)
+                return frame
+
+            self.__grab_parts(self.__stitched)
+            bgra = self.__stitched
+        else:
+            screenshot = self.__sct.grab(self.__region)  # BGRA
+            bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                screenshot.height, screenshot.width, 4
+            )
 
-        # Capture the screen content for the intersection area
-        screenshot = sct.grab(
-            (
-                intersection_rect.x(),
-                intersection_rect.y(),
-                intersection_rect.width()
-                + intersection_rect.x(),  # idk why but this is needed
-                intersection_rect.height() + intersection_rect.y(),
+        if self.__is_scaled:
+            # Area interpolation averages the pixels it merges, thin lines and text stay legible
+            bgra = cv2.resize(
+                bgra,
+                (self.output_size.width(), self.output_size.height()),
+                dst=frame if self.__bgra else self.__scaled,
+                interpolation=cv2.INTER_AREA,
             )
-        )  # BGRA
+        elif self.__bgra:
+            np.copyto(frame, bgra)
+
+        if self.__bgra:
+            return frame
+
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=frame)
+
+    def __grab_parts(self, stitched: np.ndarray) -> None:
+        assert self.__executor is not None
+        futures = [
+            self.__executor.submit(self.__grab_part, region, rect, stitched)
+            for region, rect in self.__parts[1:]
+        ]
+        region, rect = self.__parts[0]
+        self.__grab_part(region, rect, stitched)
+        for future in futures:
+            future.result()
+
+    def __grab_part(self, region: dict, rect: QRect, stitched: np.ndarray) -> None:
+        sct = getattr(self.__local, "sct", None)
+        if sct is None:
+            sct = self.__local.sct = mss.mss()
+            self.__thread_scts.append(sct)
+
+        screenshot = sct.grab(region)
+        np.copyto(
+            stitched[rect.top() : rect.bottom() + 1, rect.left() : rect.right() + 1],
+            np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                screenshot.height, screenshot.width, 4
+            ),
+        )
+
+    def close(self) -> None:
+        """
+        Release the display connections and the threads.
+
+        :return: None
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+        for sct in self.__thread_scts:
+            sct.close()
+        self.__sct.close()
 
-        frame_bgr = cv2.cvtColor(np.array(screenshot), cv2.COLOR_BGRA2BGR)
-        return frame_bgr
+
+def scaled_down_size(size: QSize, bounds: QSize | None) -> QSize:
+    """
+    Fit a size into bounds, keeping its aspect ratio. It is never scaled up.
+
+    :param QSize size: The size to fit
+    :param bounds: The largest size allowed, None for no limit
+    :type bounds: QSize | None
+    :return: The scaled size, at least 1x1
+    :rtype: QSize
+    """
+    if bounds is None or (
+        size.width() <= bounds.width() and size.height() <= bounds.height()
+    ):
+        return QSize(size)
+
+    scaled = size.scaled(bounds, Qt.AspectRatioMode.KeepAspectRatio)
+    return scaled.expandedTo(QSize(1, 1))
+
+
+def capture_mss(rect: QRect) -> MatLike | None:
+    """
+    Grab a single frame of the given area. Use ScreenGrabber instead when grabbing repeatedly.
+
+    :param rect: The area to capture
+    :type rect: QRect
+    :return: The BGR frame, or None if the area is outside of every screen
+    :rtype: MatLike | None
+    """
+    with ScreenGrabber(rect) as grabber:
+        frame_bgr = grabber.grab()
+        return None if frame_bgr is None else frame_bgr.copy()
 
 
 def get_focus_screen_geometry() -> QRect:
@@ -16,6 +16,7 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 import os
+from functionalities.recording_telemetry import sidecar_path
 from preload import ICON_DIR, BECAP_VIDEO_PATH
 import shutil
 
@@ -164,6 +165,10 @@ class VideoPlayer(QWidget):
         video_path = os.path.join(BECAP_VIDEO_PATH, f"becap_video_{saved_time}.mp4")
         shutil.copy(self.__video_path, video_path)
 
+        # The telemetry of the recording goes along with it, when there is some
+        if os.path.isfile(sidecar_path(self.__video_path)):
+            shutil.copy(sidecar_path(self.__video_path), sidecar_path(video_path))
+
     def set_video(self, video_path: str) -> None:
         """
         Set the video to be played.
@@ -1,9 +1,9 @@
 from enum import Enum
+import math
 import threading
 import platform
 import time
 from ffmpeg.nodes import os
-from numpy.lib import math
 from typing import Callable, Optional
 from PyQt6.QtGui import (
     QBrush,
@@ -15,25 +15,113 @@ from PyQt6.QtGui import (
 )
 import cv2
 import pyaudio
+import queue
+import subprocess
 import wave
 import asyncio
-from multiprocessing import Process, Manager
+from multiprocessing import Process
 from multiprocessing.synchronize import Event
-from multiprocessing.managers import DictProxy
 import multiprocessing
+import numpy as np
 
 from globals import processes
 
-from PyQt6.QtCore import QElapsedTimer, QRect, QTimer, Qt
-from PyQt6.QtWidgets import QPushButton, QWidget
+from PyQt6.QtCore import (
+    QElapsedTimer,
+    QRect,
+    QSize,
+    QThread,
+    QTimer,
+    Qt,
+    pyqtSignal,
+)
+from PyQt6.QtWidgets import QLabel, QPushButton, QWidget
 
 from components import utils
+from components.message_dialog import CustomCriticalDialog
+from components.progress_dialog import ProgressDialog
+from functionalities.frame_pacing import NANOSECONDS_PER_SECOND, FramePacer
+from functionalities.encoder_profile import (
+    BALANCED_PROFILE,
+    REALTIME_PROFILE,
+    EncoderProfile,
+    get_encoder_profile,
+)
+from functionalities.frame_ring_buffer import FrameRingBuffer
 from functionalities.video_processing import (
+    StreamingEncoder,
+    mux_video_and_audio_ffmpeg_python,
+    mux_video_and_audio_ffmpeg_raw_command,
     process_video_and_audio_ffmpeg_python,
     process_video_and_audio_ffmpeg_raw_command,
 )
 
-from preload import TEMP_DIR
+from functionalities.recording_session import RecordingSession, find_orphaned_sessions
+from functionalities.recording_telemetry import (
+    TELEMETRY_FILE,
+    RecordingTelemetry,
+    sidecar_path,
+)
+
+from preload import BECAP_VIDEO_PATH, TEMP_DIR
+
+# Every recording keeps its files in a directory of its own here until it is finished
+SESSIONS_DIR = os.path.join(TEMP_DIR, "sessions")
+# Orphaned recordings that failed to be recovered this many times are left alone
+MAX_RECOVERY_ATTEMPTS = 3
+
+# Memory the frames waiting to be written may take, which bounds the frame ring and queue
+FRAME_MEMORY_BUDGET = 256 * 1024 * 1024
+# The writer is never allowed more than this far behind, whatever the budget
+MAX_QUEUED_SECONDS = 2
+# How far the capture rate may be divided under BackpressurePolicy.DEGRADE
+MAX_CAPTURE_DIVIDER = 8
+# Once the screen has not changed for this long, it is only looked at every few frames until it changes again
+STILL_SCREEN_SECONDS = 0.5
+STILL_CAPTURE_DIVIDER = 4
+# A frame held while the screen is still is written again this often, so the video file keeps getting new fragments
+# (or replay segments) and what was recorded can be played up to about now
+HELD_FRAME_REFRESH_SECONDS = 1
+# Replay buffers are a ring of segments this long, saving one takes whole segments
+REPLAY_SEGMENT_SECONDS = 2
+REPLAY_SEGMENT_PATTERN = "segment_%03d.mkv"
+REPLAY_SEGMENT_LIST = "segments.csv"
+# Audio chunks waiting to be written to disk, about 1.5 s at the default rate and chunk size
+AUDIO_BUFFER_CHUNKS = 64
+# How often the telemetry of a recording is sampled, in milliseconds
+TELEMETRY_INTERVAL = 1000
+
+
+class VideoType(Enum):
+    """
+    The kind of video the recorder writes while recording.
+
+    MP4: frames are encoded to H.264 on the fly, stopping only has to add the audio.
+    AVI: frames go into an intermediate XVID file, which is re-encoded after the recording.
+    REPLAY: frames are encoded to H.264 segments in a directory, only the latest ones are kept.
+    """
+
+    MP4 = 1
+    AVI = 2
+    REPLAY = 3
+
+
+class BackpressurePolicy(Enum):
+    """
+    What the recorder does with a new frame when the writer is so far behind that the frame queue is full.
+
+    DROP_OLDEST: the oldest queued frame makes room for the new one, the video stays close to real time.
+    DROP_NEWEST: the new frame is dropped, the queued ones are written as they are. Capture pauses rather than overwrite
+        a frame the writer has not read yet.
+    DEGRADE: like DROP_NEWEST, and the capture rate is halved while the queue is filling up, until the writer catches up
+        again.
+
+    Either way the video keeps its frame rate and duration, the previous frame is shown in place of a dropped one.
+    """
+
+    DROP_OLDEST = 1
+    DROP_NEWEST = 2
+    DEGRADE = 3
 
 
 def find_default_device(p: pyaudio.PyAudio) -> tuple[int, str] | None:
@@ -71,115 +159,536 @@ def find_default_device(p: pyaudio.PyAudio) -> tuple[int, str] | None:
     return best_device
 
 
+# PyAudio and the index of the input device, kept by the audio worker from one recording to the next
+__audio_input: tuple[pyaudio.PyAudio, int] | None = None
+
+
+def __open_audio_input(refresh: bool = False) -> tuple[pyaudio.PyAudio, int] | None:
+    """
+    Return PyAudio and the input device to record from, loading them on first use.
+
+    :param bool refresh: Look for the device again, e.g. because it was unplugged
+    :return: PyAudio and the index of the device, None if there is no input device
+    :rtype: tuple[pyaudio.PyAudio, int] | None
+    """
+    global __audio_input
+    if __audio_input is not None and not refresh:
+        return __audio_input
+
+    if __audio_input is not None:
+        __audio_input[0].terminate()
+        __audio_input = None
+
+    p = pyaudio.PyAudio()
+    default_device = find_default_device(p)
+    if default_device is None:
+        print("No default audio device found")
+        p.terminate()
+        return None
+
+    __audio_input = (p, default_device[0])
+    return __audio_input
+
+
+def warm_up_audio_task(shared: "RecordingSharedState") -> None:
+    """Load PyAudio and pick the input device before the first recording needs them."""
+    __open_audio_input()
+
+
 def record_audio_task(
-    is_recording: Event,
+    shared: "RecordingSharedState",
     filename: str,
     channels: int,
     rate: int,
     chunk: int,
 ) -> None:
+    is_recording = shared.is_recording_audio
+    start_time = shared.audio_start_time
+    dropped_chunks = shared.dropped_chunks
+    input_overflows = shared.input_overflows
     if not is_recording.is_set():
         return
 
-    p = pyaudio.PyAudio()
-    default_device = find_default_device(p)
-    if default_device is None:
-        print("No default audio device found")
+    audio_input = __open_audio_input()
+    if audio_input is None:
         return
 
-    index, _ = default_device
-    stream = p.open(
-        format=pyaudio.paInt16,
-        channels=channels,
-        rate=rate,
-        input=True,
-        frames_per_buffer=chunk,
-        input_device_index=index,
-    )
-
-    frames = []
+    # PortAudio hands the chunks over on its own thread, they wait here until they are written to disk
+    chunks: queue.Queue[bytes] = queue.Queue(maxsize=AUDIO_BUFFER_CHUNKS)
 
-    print("Recording audio...")
-    while is_recording.is_set():
-        data = stream.read(chunk)
-        frames.append(data)
+    def on_chunk(in_data, frame_count, time_info, status_flags):
+        if start_time.value == 0:
+            # The first sample was taken a chunk (plus the input latency) before the callback
+            start_time.value = time.monotonic_ns() - round(
+                (frame_count / rate + latency) * NANOSECONDS_PER_SECOND
+            )
+        if status_flags & pyaudio.paInputOverflow:
+            input_overflows.value += 1
+
+        try:
+            chunks.put_nowait(in_data)
+        except queue.Full:
+            # The disk cannot keep up, better lose a chunk than block the audio thread
+            dropped_chunks.value += 1
+
+        return (None, pyaudio.paContinue)
+
+    def open_stream(p: pyaudio.PyAudio, index: int) -> "pyaudio.Stream":
+        return p.open(
+            format=pyaudio.paInt16,
+            channels=channels,
+            rate=rate,
+            input=True,
+            frames_per_buffer=chunk,
+            input_device_index=index,
+            stream_callback=on_chunk,
+        )
 
-    stream.stop_stream()
-    stream.close()
+    latency = 0.0
+    p, index = audio_input
+    try:
+        stream = open_stream(p, index)
+    except OSError:
+        # The devices changed since the input was picked
+        audio_input = __open_audio_input(refresh=True)
+        if audio_input is None:
+            return
+        p, index = audio_input
+        stream = open_stream(p, index)
+    latency = stream.get_input_latency()
 
-    p.terminate()
     with wave.open(filename, "wb") as wf:
         wf.setnchannels(channels)
         wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
         wf.setframerate(rate)
-        wf.writeframes(b"".join(frames))
 
+        print("Recording audio...")
+        # The WAV header is updated on every write, so the file stays playable up to the last chunk
+        while is_recording.is_set():
+            try:
+                wf.writeframes(chunks.get(timeout=0.1))
+            except queue.Empty:
+                pass
+
+        stream.stop_stream()
+        stream.close()
+
+        while not chunks.empty():
+            wf.writeframes(chunks.get_nowait())
+
+    if dropped_chunks.value > 0 or input_overflows.value > 0:
+        print(
+            f"Audio lost {dropped_chunks.value} chunks, the input overflowed {input_overflows.value} times"
+        )
     print("Audio saved")
 
 
+class BgrVideoWriter(cv2.VideoWriter):
+    """cv2.VideoWriter taking BGRA frames, which it only accepts as BGR."""
+
+    def write(self, image: np.ndarray) -> None:
+        super().write(cv2.cvtColor(image, cv2.COLOR_BGRA2BGR))
+
+
 def save_frame_task(
-    is_recording: Event,
-    frame_queue: multiprocessing.Queue,
-    shared_memory: DictProxy,
+    shared: "RecordingSharedState",
+    frame_ring: FrameRingBuffer,
     filename: str,
-    fourcc: int,
+    video_type: VideoType,
     fps: float,
     width: int,
     height: int,
+    segment_wrap: int,
+    encoder_profile: EncoderProfile,
 ) -> None:
-    if not is_recording.is_set():
-        return
-
-    video_out = cv2.VideoWriter(
-        filename,
-        fourcc,
-        fps,
-        (width, height),
-    )
+    total_frames = shared.total_frames
+    read_seq = shared.read_seq
+    overwritten_frames = shared.overwritten_frames
+
+    # The frames are BGRA, as grabbed
+    if video_type == VideoType.MP4:
+        video_out = StreamingEncoder(
+            filename, width, height, fps, "bgra", profile=encoder_profile
+        )
+    elif video_type == VideoType.REPLAY:
+        # `filename` is the directory of the segments
+        video_out = StreamingEncoder(
+            os.path.join(filename, REPLAY_SEGMENT_PATTERN),
+            width,
+            height,
+            fps,
+            "bgra",
+            segment_time=REPLAY_SEGMENT_SECONDS,
+            segment_wrap=segment_wrap,
+            segment_list=os.path.join(filename, REPLAY_SEGMENT_LIST),
+            profile=encoder_profile,
+        )
+    else:
+        video_out = BgrVideoWriter(
+            filename,
+            cv2.VideoWriter.fourcc(*"XVID"),
+            fps,
+            (width, height),
+        )
 
-    while is_recording.is_set():
-        if not frame_queue.empty():
-            frame = frame_queue.get()
+    frame = np.zeros(frame_ring.frame_shape, dtype=frame_ring.dtype)
+    next_frame = np.empty_like(frame)
+    # StreamingEncoder is given the tick of each frame and shows the previous one until then, cv2 wants every frame
+    holds_frames = isinstance(video_out, StreamingEncoder)
+
+    while True:
+        # Only new frames are queued, with the tick they are shown at
+        tick, seq = shared.frame_queue.get()
+
+        # The ticks in between (repeated or dropped frames) show the previous frame again
+        if not holds_frames:
+            while total_frames.value < tick:
+                video_out.write(frame)
+                total_frames.value += 1
+
+        if seq is None:  # recording stopped, `tick` is the total number of frames
+            if holds_frames and total_frames.value < tick:
+                # Or the video would end with the start of its last frame
+                video_out.write(frame, tick - 1)
+            total_frames.value = tick
+            break
+
+        # If the frame has been overwritten in the meantime, the previous one is written again
+        timestamp = frame_ring.read(seq, next_frame)
+        read_seq.value = seq
+        if timestamp is None:
+            overwritten_frames.value += 1
+        else:
+            frame, next_frame = next_frame, frame
+
+        if holds_frames:
+            video_out.write(frame, tick)
+        else:
             video_out.write(frame)
-            shared_memory["total_frames"] += 1
-
-    while not frame_queue.empty():
-        frame = frame_queue.get()
-        video_out.write(frame)
-        shared_memory["total_frames"] += 1
+        total_frames.value = tick + 1
 
     video_out.release()
-    cv2.destroyAllWindows()
+    frame_ring.close()
     print("Video saved")
+    if overwritten_frames.value > 0:
+        print(
+            f"{overwritten_frames.value} frames were overwritten before they could be written"
+        )
 
 
 def calculate_frame_task(
-    is_recording: Event, shared_memory: DictProxy, capture_area: QRect
+    shared: "RecordingSharedState",
+    frame_ring: FrameRingBuffer,
+    overwrite_unread: bool,
+    capture_area: QRect,
+    fps: float,
+    start_time: int,
+) -> None:
+    is_recording = shared.is_recording
+    capture_divider = shared.capture_divider
+    read_seq = shared.read_seq
+    grabbed_frames = shared.grabbed_frames
+    unchanged_frames = shared.unchanged_frames
+    grab_lateness = shared.grab_lateness
+
+    seq = 0
+    ticks = 0
+    next_grab_tick = 0
+    pacer = FramePacer(fps, start_time)
+
+    # The latest published frame, and for how many grabs in a row the screen has looked the same
+    previous_frame: np.ndarray | None = None
+    still_grabs = 0
+    still_divider = 1
+
+    # Frames are scaled to the size of the ring as they are grabbed, only that size crosses to the other processes. They
+    # stay BGRA, as grabbed, the encoder converts them anyway.
+    height, width = frame_ring.frame_shape[:2]
+    with utils.ScreenGrabber(capture_area, QSize(width, height), bgra=True) as grabber:
+        while is_recording.is_set():
+            # Grab once per frame interval, a missed deadline is simply skipped
+            ticks += pacer.wait()
+
+            # Under backpressure or while the screen is still, only every few frames are grabbed
+            if ticks <= next_grab_tick:
+                continue
+            next_grab_tick = ticks - 1 + max(capture_divider.value, still_divider)
+
+            # Unless the oldest frames may go, the frames the writer has yet to read are not overwritten
+            if (
+                not overwrite_unread
+                and seq + 1 - read_seq.value >= frame_ring.slot_count
+            ):
+                continue
+
+            timestamp = time.monotonic_ns()
+            lateness = pacer.lateness(timestamp)
+            with grab_lateness.get_lock():
+                grab_lateness.value = max(grab_lateness.value, lateness)
+
+            # Grab straight into the slot, no intermediate frame is made
+            frame = frame_ring.begin_write(seq + 1)
+            if grabber.grab(frame) is None:
+                break
+            grabbed_frames.value += 1
+
+            if (
+                previous_frame is not None
+                and cv2.norm(frame, previous_frame, cv2.NORM_INF) == 0
+            ):
+                # Nothing changed: the frame is not published (the slot is grabbed into again next time), so the
+                # writer keeps showing the previous one, which StreamingEncoder does without encoding it again
+                unchanged_frames.value += 1
+                still_grabs += 1
+                if still_grabs >= STILL_SCREEN_SECONDS * fps:
+                    still_divider = STILL_CAPTURE_DIVIDER
+                continue
+
+            # Back to the full frame rate as soon as something moves
+            still_grabs = 0
+            still_divider = 1
+
+            seq += 1
+            frame_ring.end_write(seq, timestamp)
+            previous_frame = frame
+
+    frame_ring.close()
+
+
+def recording_worker_task(
+    shared: "RecordingSharedState", commands: multiprocessing.Queue, idle: Event
 ) -> None:
-    while is_recording.is_set():
-        frame_bgr = utils.capture_mss(capture_area)
-        shared_memory["latest_frame"] = frame_bgr
+    """
+    Main loop of a pooled worker: run the tasks it is sent, one at a time, until it gets None.
+
+    :param RecordingSharedState shared: The state shared with the recorders, passed on to every task
+    :param multiprocessing.Queue commands: (task, args) pairs, the task is called with `shared` and then `args`
+    :param Event idle: Set whenever the worker is waiting for a task
+    :return: None
+    """
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+
+        task, args = command
+        try:
+            task(shared, *args)
+        except Exception as e:
+            # The worker outlives a failed recording
+            print(f"Recording task {task.__name__} failed: {e}")
+        finally:
+            idle.set()
+
+
+class RecordingWorker(Enum):
+    """The processes of a RecordingWorkerPool."""
+
+    CAPTURE = 1
+    WRITER = 2
+    AUDIO = 3
+
+
+class RecordingSharedState:
+    """
+    The events, counters and queue the recorders share with the pooled workers.
+
+    Those can only be handed to a process when it is created, so they are made once with the pool and reset between
+    recordings. Everything that depends on the recording itself (the frame ring, the capture area...) is sent along
+    with the tasks instead.
+    """
+
+    def __init__(self, frame_queue_size: int) -> None:
+        """
+        :param int frame_queue_size: The most frames that can wait to be written, for any recording
+        """
+        self.frame_queue_size = frame_queue_size
+        self.is_recording = multiprocessing.Event()
+        self.frame_queue = multiprocessing.Queue(maxsize=frame_queue_size)
+        self.total_frames = multiprocessing.Value("q", 0)
+        self.read_seq = multiprocessing.Value("q", 0)
+        self.overwritten_frames = multiprocessing.Value("q", 0)
+        self.grabbed_frames = multiprocessing.Value("q", 0)
+        self.unchanged_frames = multiprocessing.Value("q", 0)
+        # The most a grab was late on its deadline since the last telemetry sample, in nanoseconds
+        self.grab_lateness = multiprocessing.Value("q", 0)
+        self.capture_divider = multiprocessing.Value("i", 1)
+
+        self.is_recording_audio = multiprocessing.Event()
+        self.audio_start_time = multiprocessing.Value("q", 0)
+        self.dropped_chunks = multiprocessing.Value("q", 0)
+        self.input_overflows = multiprocessing.Value("q", 0)
+
+    def reset_screen(self) -> None:
+        # Left over by a recording whose writer died before reading them all
+        try:
+            while True:
+                self.frame_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        self.total_frames.value = 0
+        self.read_seq.value = 0
+        self.overwritten_frames.value = 0
+        self.grabbed_frames.value = 0
+        self.unchanged_frames.value = 0
+        self.grab_lateness.value = 0
+        self.capture_divider.value = 1
+
+    def reset_audio(self) -> None:
+        self.audio_start_time.value = 0
+        self.dropped_chunks.value = 0
+        self.input_overflows.value = 0
+
+
+class RecordingWorkerPool:
+    """
+    The capture, writer and audio processes, started once with the app and reused by every recording.
+
+    Spawning the workers (and, on Windows, importing cv2, PyQt6 and PyAudio again in each of them) and looking for the
+    audio device used to delay the first frames of every recording. Pooled workers are already waiting when the
+    recording starts, the audio one with the device picked.
+    """
 
+    def __init__(
+        self,
+        max_fps: float = 60.0,
+        workers: tuple[RecordingWorker, ...] = tuple(RecordingWorker),
+    ) -> None:
+        """
+        :param float max_fps: The highest frame rate recordings will use, which sizes the frame queue
+        :param workers: The workers to start, e.g. no audio one for recordings without sound
+        :type workers: tuple[RecordingWorker, ...]
+        """
+        self.shared = RecordingSharedState(round(MAX_QUEUED_SECONDS * max_fps))
+        self.__worker_kinds = workers
+        self.__workers: dict[
+            RecordingWorker, tuple[Process, multiprocessing.Queue, Event]
+        ] = {}
+
+    def start(self) -> None:
+        """Start the workers, they warm up in the background."""
+        for worker in self.__worker_kinds:
+            self.__start_worker(worker)
+
+        if RecordingWorker.AUDIO in self.__workers:
+            self.submit(RecordingWorker.AUDIO, warm_up_audio_task)
+
+    def __start_worker(self, worker: RecordingWorker) -> None:
+        commands = multiprocessing.Queue()
+        idle = multiprocessing.Event()
+        idle.set()
+
+        process = Process(
+            target=recording_worker_task,
+            daemon=True,
+            args=(self.shared, commands, idle),
+        )
+        processes.append(process)
+        process.start()
 
-class VideoType(Enum):
-    MP4 = 1
-    AVI = 2
+        self.__workers[worker] = (process, commands, idle)
+
+    def submit(self, worker: RecordingWorker, task: Callable, *args) -> None:
+        """
+        Have a worker run a task, after the ones it was given before.
+
+        :param RecordingWorker worker: The worker to run the task
+        :param task: A module level function, called with the shared state and then `args`
+        :type task: Callable
+        :param args: The other arguments of the task, they must be picklable
+        :return: None
+        """
+        _, commands, idle = self.__workers[worker]
+        idle.clear()
+        commands.put((task, args))
+
+    def is_busy(self, worker: RecordingWorker) -> bool:
+        """
+        Tell whether a worker is still running a task.
+
+        :param RecordingWorker worker: The worker
+        :return: False once it is done with its tasks, or dead
+        :rtype: bool
+        """
+        process, _, idle = self.__workers[worker]
+        return not idle.is_set() and process.is_alive()
+
+    def wait_until_idle(self, worker: RecordingWorker) -> None:
+        """
+        Block until a worker is done with its tasks. A worker that died on the way is replaced.
+
+        :param RecordingWorker worker: The worker to wait for
+        :return: None
+        """
+        process, _, idle = self.__workers[worker]
+        while not idle.wait(0.1):
+            if not process.is_alive():
+                print(f"The {worker.name.lower()} worker died, starting a new one")
+                processes.remove(process)
+                self.__start_worker(worker)
+                return
+
+    def shutdown(self) -> None:
+        """Stop the workers once they are done with their tasks."""
+        for process, commands, _ in self.__workers.values():
+            commands.put(None)
+
+        for process, _, _ in self.__workers.values():
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+            processes.remove(process)
+
+        self.__workers.clear()
 
 
 class VideoRecorder(QWidget):
     def __init__(
         self,
         capture_area: QRect,
-        on_finish: Callable[[], None],
+        on_finish: Callable[[bool], None],
+        worker_pool: RecordingWorkerPool,
+        video_type: VideoType = VideoType.MP4,
+        backpressure_policy: BackpressurePolicy = BackpressurePolicy.DROP_OLDEST,
+        encoder_profile: EncoderProfile | None = None,
+        show_telemetry: bool = False,
+        output_size: QSize | None = None,
     ) -> None:
+        """
+        :param QRect capture_area: The area of the screen to record
+        :param on_finish: Called once recording is over, with whether the video was saved
+        :type on_finish: Callable[[bool], None]
+        :param RecordingWorkerPool worker_pool: The workers that do the recording
+        :param VideoType video_type: How the video is written while recording
+        :param BackpressurePolicy backpressure_policy: What to do when the video cannot be written fast enough
+        :param encoder_profile: How the final video is encoded. By default REALTIME_PROFILE when it is encoded while
+            recording (VideoType.MP4), BALANCED_PROFILE when it is encoded afterwards.
+        :type encoder_profile: EncoderProfile or None
+        :param bool show_telemetry: Show the frame rate, drops, queue depth... under the stop button while recording.
+            They are written to a JSON sidecar of the video either way.
+        :param output_size: The largest size of the video, a larger capture area is scaled down to fit (e.g. 1920x1080
+            for a 4K screen). None to keep the size of the capture area.
+        :type output_size: QSize or None
+        """
         super().__init__()
 
         self.__capture_area = capture_area
         self.__on_finish = on_finish
-        self.__temp_video_file_path = os.path.join(TEMP_DIR, "video.avi")
-        self.__temp_audio_file_path = os.path.join(TEMP_DIR, "audio.wav")
+        self.__worker_pool = worker_pool
+        self.__video_type = video_type
+        self.__backpressure_policy = backpressure_policy
+        if encoder_profile is None:
+            encoder_profile = (
+                REALTIME_PROFILE if video_type == VideoType.MP4 else BALANCED_PROFILE
+            )
+        self.__encoder_profile = encoder_profile
+        self.__output_size = output_size
         self.video_file_path = os.path.join(TEMP_DIR, "output.mp4")
         self.__fps = 30.0
+        self.__session: RecordingSession | None = None
+        self.__telemetry: RecordingTelemetry | None = None
+        self.__finalizer: RecordingFinalizer | None = None
 
         # UI setup
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
@@ -196,26 +705,39 @@ class VideoRecorder(QWidget):
         self.setGeometry(full_geometry)
 
         self.hide()
-        self.__stop_button_wrapper = StopBtnWrapper(self.stop_recording)
+        self.__stop_button_wrapper = StopBtnWrapper(self.stop_recording, show_telemetry)
         self.__stop_button_wrapper.raise_()
         self.__stop_button_wrapper.hide()
 
         self.__elapsed_time = QElapsedTimer()
         self.__timer = QTimer(self)
         self.__timer.timeout.connect(self.__update_button_text)
+        self.__timer.timeout.connect(self.__save_audio_offset)
         self.__timer.start(100)
 
+        self.__telemetry_timer = QTimer(self)
+        self.__telemetry_timer.timeout.connect(self.__sample_telemetry)
+
     def start_recording(self):
         """Start recording video and audio."""
-        if os.path.exists(self.__temp_video_file_path):
-            print("Removing existing video file")
-            os.remove(self.__temp_video_file_path)
-        if os.path.exists(self.__temp_audio_file_path):
-            print("Removing existing audio file")
-            os.remove(self.__temp_audio_file_path)
-        if os.path.exists(self.video_file_path):
-            print("Removing existing output file")
-            os.remove(self.video_file_path)
+        for file in (self.video_file_path, sidecar_path(self.video_file_path)):
+            if os.path.exists(file):
+                print(f"Removing existing output file {file}")
+                os.remove(file)
+
+        # What is needed to finish the recording if the app dies before it does
+        self.__session = RecordingSession.create(
+            SESSIONS_DIR,
+            video_type=self.__video_type.name,
+            fps=self.__fps,
+            video_file=(
+                "video.mp4" if self.__video_type == VideoType.MP4 else "video.avi"
+            ),
+            audio_file="audio.wav",
+            audio_offset=None,
+            encoder_profile=self.__encoder_profile.name,
+        )
+        self.__telemetry = RecordingTelemetry(self.__session.file(TELEMETRY_FILE))
 
         self.__elapsed_time.start()
 
@@ -223,49 +745,69 @@ class VideoRecorder(QWidget):
         self.showFullScreen()
         self.__stop_button_wrapper.show()
 
-        self.__audio_recorder = AudioRecorder(self.__temp_audio_file_path)
+        self.__audio_recorder = AudioRecorder(
+            self.__worker_pool, self.__session.file(self.__session.info["audio_file"])
+        )
         self.__screen_recorder = ScreenRecorder(
-            self.__capture_area, self.__temp_video_file_path, self.__fps
+            self.__worker_pool,
+            self.__capture_area,
+            self.__session.file(self.__session.info["video_file"]),
+            self.__fps,
+            self.__video_type,
+            self.__backpressure_policy,
+            encoder_profile=self.__encoder_profile,
+            output_size=self.__output_size,
         )
 
         asyncio.run(self.__start_tasks())
+        self.__telemetry_timer.start(TELEMETRY_INTERVAL)
 
     def stop_recording(self):
-        """Stop recording and merge audio and video."""
-        asyncio.run(self.__stop_tasks())
+        """Stop recording, audio and video are merged in the background."""
+        if self.__finalizer is not None:
+            return
 
+        self.__timer.stop()
+        self.__telemetry_timer.stop()
         self.close()
         self.__stop_button_wrapper.close()
 
-        # Merge audio and video
-        print("Merging audio and video")
-        actual_duration = self.__elapsed_time.elapsed() / 1000
-        os_name = platform.system()
-
-        if os_name == "Windows":
-            process_video_and_audio_ffmpeg_raw_command(
-                self.__temp_video_file_path,
-                self.__temp_audio_file_path,
-                self.video_file_path,
-                self.__fps,
-                actual_duration,
-            )
-        elif os_name == "Linux":
-            process_video_and_audio_ffmpeg_python(
-                self.__temp_video_file_path,
-                self.__temp_audio_file_path,
-                self.video_file_path,
-                self.__fps,
-                actual_duration,
-            )
+        assert self.__session is not None
+        self.__finalizer = RecordingFinalizer(
+            self.__screen_recorder,
+            self.__audio_recorder,
+            self.__video_type,
+            self.__session,
+            self.video_file_path,
+            self.__encoder_profile,
+        )
+        self.__progress_dialog = ProgressDialog(
+            "Saving video...", self.__finalizer.cancel
+        )
+        self.__finalizer.progress_changed.connect(self.__progress_dialog.set_progress)
+        self.__finalizer.finalized.connect(self.__on_finalized)
+        self.__finalizer.finalization_cancelled.connect(
+            self.__on_finalization_cancelled
+        )
+        self.__finalizer.finalization_error.connect(self.__on_finalization_error)
+        self.__finalizer.start()
 
-        self.__on_finish()
+        self.__progress_dialog.show()
 
-    async def __stop_tasks(self):
-        audio_task = asyncio.create_task(self.__audio_recorder.stop())
-        screen_task = asyncio.create_task(self.__screen_recorder.stop())
+    # The main window must be back before the dialog closes, or Qt quits with its last window
+    def __on_finalized(self) -> None:
+        self.__on_finish(True)
+        self.__progress_dialog.finish()
 
-        await asyncio.gather(audio_task, screen_task)
+    def __on_finalization_cancelled(self) -> None:
+        print("Saving the video was cancelled")
+        self.__on_finish(False)
+        self.__progress_dialog.finish()
+
+    def __on_finalization_error(self, message: str) -> None:
+        CustomCriticalDialog("Error", f"Failed to save the video: {message}").exec()
+        self.__on_finish(False)
+        self.__progress_dialog.finish()
 
     def paintEvent(self, a0: Optional[QPaintEvent]) -> None:
         """Darken the screen and highlight the selected area."""
@@ -283,6 +825,33 @@ class VideoRecorder(QWidget):
 
         painter.drawRect(self.rect())
 
+    def __save_audio_offset(self) -> None:
+        # Saved as soon as it is known, a recovered recording has its audio in sync too
+        if (
+            self.__session is None
+            or self.__session.info["audio_offset"] is not None
+            or self.__finalizer is not None
+            or self.__audio_recorder.start_time == 0
+        ):
+            return
+
+        self.__session.update(
+            audio_offset=(
+                self.__audio_recorder.start_time - self.__screen_recorder.start_time
+            )
+            / NANOSECONDS_PER_SECOND
+        )
+
+    def __sample_telemetry(self) -> None:
+        assert self.__telemetry is not None
+        sample = {
+            "time": round(self.__elapsed_time.elapsed() / 1000, 1),
+            **self.__screen_recorder.telemetry(),
+            **self.__audio_recorder.telemetry(),
+        }
+        self.__telemetry.record(sample)
+        self.__stop_button_wrapper.set_telemetry(sample)
+
     def __update_button_text(self):
         elapsed = self.__elapsed_time.elapsed() // 1000
         self.__stop_button_wrapper.stop_button.setText(
@@ -296,25 +865,297 @@ class VideoRecorder(QWidget):
         await asyncio.gather(audio_task, screen_task)
 
 
+def merge_recording(
+    video_type: VideoType,
+    video_file: str,
+    audio_file: str,
+    output_file: str,
+    audio_offset: float = 0.0,
+    on_progress: Callable[[float], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    encoder_profile: EncoderProfile = BALANCED_PROFILE,
+) -> None:
+    """
+    Turn the files written while recording into the final video. The recorded files are removed on success.
+
+    :param VideoType video_type: How the video was written
+    :param str video_file: The recorded video
+    :param str audio_file: The recorded audio, it may not exist
+    :param str output_file: The video to write
+    :param float audio_offset: When the audio started, in seconds after the first video frame
+    :param on_progress: Called with how much of the output is written, in seconds
+    :type on_progress: Callable[[float], None] | None
+    :param is_cancelled: Polled while merging, the merge stops once it returns True
+    :type is_cancelled: Callable[[], bool] | None
+    :param EncoderProfile encoder_profile: How the audio, and the video unless it is final already, are encoded
+    :return: None
+    :raises InterruptedError: if the merge was cancelled
+    """
+    os_name = platform.system()
+    if video_type == VideoType.MP4:
+        # The video was encoded with the profile while recording, so it is copied as is (`-c:v copy`) and only the
+        # audio is encoded
+        merge = (
+            mux_video_and_audio_ffmpeg_raw_command
+            if os_name == "Windows"
+            else mux_video_and_audio_ffmpeg_python
+        )
+    else:
+        # An XVID video never has the codec of the profile, it has to be re-encoded
+        merge = (
+            process_video_and_audio_ffmpeg_raw_command
+            if os_name == "Windows"
+            else process_video_and_audio_ffmpeg_python
+        )
+
+    merge(
+        video_file,
+        audio_file,
+        output_file,
+        audio_offset,
+        on_progress=on_progress,
+        is_cancelled=is_cancelled,
+        profile=encoder_profile,
+    )
+
+
+def recover_orphaned_recordings() -> None:
+    """
+    Finish the recordings that were interrupted by a crash, saving them to the video folder.
+
+    The MP4 video is fragmented and the WAV header is kept up to date while recording, so both are readable up to
+    the moment the app died.
+    """
+    for session in find_orphaned_sessions(SESSIONS_DIR):
+        info = session.info
+        video_file = session.file(info.get("video_file", ""))
+        if not os.path.isfile(video_file) or os.path.getsize(video_file) == 0:
+            print(f"Nothing to recover in {session.path}")
+            session.remove()
+            continue
+
+        attempts = info.get("recovery_attempts", 0)
+        if attempts >= MAX_RECOVERY_ATTEMPTS:
+            continue
+        session.update(recovery_attempts=attempts + 1)
+
+        saved_time = time.strftime(
+            "%Y%m%d%H%M%S", time.localtime(info.get("created_at", time.time()))
+        )
+        output_file = os.path.join(
+            BECAP_VIDEO_PATH, f"becap_recovered_{saved_time}.mp4"
+        )
+        print(f"Recovering interrupted recording {session.path} to {output_file}")
+        try:
+            merge_recording(
+                VideoType[info.get("video_type", VideoType.MP4.name)],
+                video_file,
+                session.file(info.get("audio_file", "audio.wav")),
+                output_file,
+                info.get("audio_offset") or 0.0,
+                encoder_profile=get_encoder_profile(info.get("encoder_profile")),
+            )
+        except (OSError, KeyError, subprocess.CalledProcessError) as e:
+            print(f"Failed to recover {session.path}: {e}")
+            continue
+
+        try:
+            RecordingTelemetry(session.file(TELEMETRY_FILE)).save_sidecar(
+                output_file, {"recording": info}
+            )
+        except OSError as e:
+            print(f"Failed to save the telemetry of {output_file}: {e}")
+        session.remove()
+
+
+class RecordingFinalizer(QThread):
+    """
+    Stops the recorders and merges audio and video into the final file, off the GUI thread.
+
+    The merge reports its progress as a fraction of the recorded duration and can be cancelled, which deletes the
+    partially written file. The session of the recording is removed once it is merged or cancelled, a failed one is
+    left to be recovered.
+    """
+
+    progress_changed = pyqtSignal(float)
+    finalized = pyqtSignal()
+    finalization_cancelled = pyqtSignal()
+    finalization_error = pyqtSignal(str)
+
+    def __init__(
+        self,
+        screen_recorder: "ScreenRecorder",
+        audio_recorder: "AudioRecorder",
+        video_type: VideoType,
+        session: RecordingSession,
+        output_file: str,
+        encoder_profile: EncoderProfile = BALANCED_PROFILE,
+    ) -> None:
+        super().__init__()
+        self.__screen_recorder = screen_recorder
+        self.__audio_recorder = audio_recorder
+        self.__video_type = video_type
+        self.__session = session
+        self.__output_file = output_file
+        self.__encoder_profile = encoder_profile
+        self.__cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop merging as soon as possible, recording itself is always stopped cleanly."""
+        self.__cancelled.set()
+
+    def run(self) -> None:
+        # Whatever goes wrong, the dialog waiting on the finalization must hear about it
+        try:
+            self.__finalize()
+        except InterruptedError:
+            self.__session.remove()
+            self.finalization_cancelled.emit()
+        except Exception as e:
+            self.finalization_error.emit(str(e))
+
+    def __finalize(self) -> None:
+        asyncio.run(self.__stop_tasks())
+
+        session = self.__session
+        if self.__cancelled.is_set():
+            raise InterruptedError("The merge was cancelled")
+
+        print("Merging audio and video")
+        audio_offset = 0.0
+        if self.__audio_recorder.start_time > 0:
+            audio_offset = (
+                self.__audio_recorder.start_time - self.__screen_recorder.start_time
+            ) / NANOSECONDS_PER_SECOND
+        session.update(audio_offset=audio_offset)
+        duration = self.__screen_recorder.duration
+
+        def on_progress(seconds: float) -> None:
+            if duration > 0:
+                self.progress_changed.emit(seconds / duration)
+
+        merge_recording(
+            self.__video_type,
+            session.file(session.info["video_file"]),
+            session.file(session.info["audio_file"]),
+            self.__output_file,
+            audio_offset,
+            on_progress=on_progress,
+            is_cancelled=self.__cancelled.is_set,
+            encoder_profile=self.__encoder_profile,
+        )
+
+        self.__save_telemetry()
+        session.remove()
+        self.finalized.emit()
+
+    def __save_telemetry(self) -> None:
+        screen_recorder = self.__screen_recorder
+        telemetry = RecordingTelemetry(self.__session.file(TELEMETRY_FILE))
+        try:
+            # The counts up to the very end
+            telemetry.record(
+                {
+                    "time": round(screen_recorder.duration, 1),
+                    **screen_recorder.telemetry(),
+                    **self.__audio_recorder.telemetry(),
+                }
+            )
+            telemetry.save_sidecar(
+                self.__output_file,
+                {
+                    "recording": self.__session.info,
+                    "duration": round(screen_recorder.duration, 2),
+                    "achieved_fps": round(screen_recorder.achieved_fps, 1),
+                    "max_queue_depth": screen_recorder.max_queue_depth,
+                    "queue_capacity": screen_recorder.queue_capacity,
+                },
+            )
+        except OSError as e:
+            # The video matters, not its telemetry
+            print(f"Failed to save the telemetry of {self.__output_file}: {e}")
+
+    async def __stop_tasks(self):
+        audio_task = asyncio.create_task(self.__audio_recorder.stop())
+        screen_task = asyncio.create_task(self.__screen_recorder.stop())
+
+        await asyncio.gather(audio_task, screen_task)
+
+
 class ScreenRecorder:
     def __init__(
         self,
+        worker_pool: RecordingWorkerPool,
         capture_area: QRect,
         filename: str,
         fps: float,
+        video_type: VideoType = VideoType.MP4,
+        backpressure_policy: BackpressurePolicy = BackpressurePolicy.DROP_OLDEST,
+        memory_budget: int = FRAME_MEMORY_BUDGET,
+        replay_seconds: float = 0.0,
+        encoder_profile: EncoderProfile = REALTIME_PROFILE,
+        output_size: QSize | None = None,
     ) -> None:
-        self.__capture_area = capture_area
+        """
+        :param RecordingWorkerPool worker_pool: The workers that capture and write the frames
+        :param QRect capture_area: The area of the screen to record
+        :param str filename: The video file to write, or the directory of the segments for VideoType.REPLAY
+        :param float fps: The frame rate of the video
+        :param VideoType video_type: How the video is written
+        :param BackpressurePolicy backpressure_policy: What to do when the writer cannot keep up
+        :param int memory_budget: How much memory the frames waiting to be written may take, in bytes
+        :param float replay_seconds: For VideoType.REPLAY, how many seconds of video the segments must cover
+        :param EncoderProfile encoder_profile: How the frames are encoded while recording, unused for VideoType.AVI
+        :param output_size: The largest size of the frames, the capture area is scaled down to fit. None to keep its
+            size.
+        :type output_size: QSize or None
+        """
+        # Frames can only be grabbed where there is a screen
+        self.__capture_area = capture_area.intersected(
+            utils.get_combined_screen_geometry_mss()
+        )
         self.__fps = fps
-        self.__width, self.__height = capture_area.width(), capture_area.height()
-        self.__fourcc = cv2.VideoWriter.fourcc(*"XVID")
+        scaled_size = utils.scaled_down_size(self.__capture_area.size(), output_size)
+        self.__width, self.__height = scaled_size.width(), scaled_size.height()
+        self.__video_type = video_type
         self.__filename = filename
+        self.__backpressure_policy = backpressure_policy
+        self.__encoder_profile = encoder_profile
+        # The segment being written and a spare one come on top of those covering the replay
+        self.__segment_wrap = (
+            math.ceil(replay_seconds / REPLAY_SEGMENT_SECONDS) + 2
+            if video_type == VideoType.REPLAY
+            else 0
+        )
+        self.__worker_pool = worker_pool
+        self.__shared = worker_pool.shared
+
+        # Every queued frame must still be in the ring when the writer gets to it, besides the one being grabbed and
+        # the latest one
+        frame_size = self.__width * self.__height * 4
+        queue_size = min(
+            round(MAX_QUEUED_SECONDS * fps), self.__shared.frame_queue_size
+        )
+        slot_count = max(4, min(memory_budget // frame_size, queue_size + 2))
+        self.queue_capacity = slot_count - 2
 
         # Shared memory
-        self.__is_recording = multiprocessing.Event()
-        self.__manager = Manager()
-        self.__shared_memory = self.__manager.dict()
-        self.__frame_queue = self.__manager.Queue(maxsize=-1)
-        processes.append(self.__manager)
+        self.__is_recording = self.__shared.is_recording
+        self.__frame_ring = FrameRingBuffer(
+            slot_count, (self.__height, self.__width, 4)
+        )
+        self.__frame_queue = self.__shared.frame_queue
+        processes.append(self.__frame_ring.shared_memory)
+
+        self.__pacer: FramePacer | None = None
+        self.start_time = 0  # of the first frame, on the monotonic clock
+        self.backpressure_drops = 0
+        self.max_queue_depth = 0
+        # The tick of the latest frame handed to the writer
+        self.__last_enqueued_tick = 0
+        self.__last_divider_change = 0
+        # (elapsed seconds, frames grabbed, new frames) at the previous telemetry sample
+        self.__last_sample = (0.0, 0, 0)
 
     async def start(self) -> None:
         if self.__is_recording.is_set():
@@ -336,8 +1177,9 @@ class ScreenRecorder:
         while self.__record_thread and self.__record_thread.is_alive():
             self.__record_thread.join()
 
-        self.__manager.shutdown()
-        processes.remove(self.__manager)
+        processes.remove(self.__frame_ring.shared_memory)
+        self.__frame_ring.unlink()
+        self.__frame_ring.close()
 
         print("Recording process stopped")
 
@@ -345,123 +1187,311 @@ class ScreenRecorder:
         if not self.__is_recording.is_set():
             return
 
-        self.__shared_memory["total_frames"] = 0
-        self.__shared_memory["latest_frame"] = None
+        worker_pool = self.__worker_pool
+        worker_pool.wait_until_idle(RecordingWorker.CAPTURE)
+        worker_pool.wait_until_idle(RecordingWorker.WRITER)
+        self.__shared.reset_screen()
+
+        # The capture worker grabs on the frame deadlines, this thread picks up the frames half an interval later
+        start_time = self.start_time = time.monotonic_ns()
+        self.__pacer = FramePacer(self.__fps, start_time, phase=0.5)
+
+        worker_pool.submit(
+            RecordingWorker.CAPTURE,
+            calculate_frame_task,
+            self.__frame_ring,
+            self.__backpressure_policy == BackpressurePolicy.DROP_OLDEST,
+            self.__capture_area,
+            self.__fps,
+            start_time,
+        )
+        worker_pool.submit(
+            RecordingWorker.WRITER,
+            save_frame_task,
+            self.__frame_ring,
+            self.__filename,
+            self.__video_type,
+            self.__fps,
+            self.__width,
+            self.__height,
+            self.__segment_wrap,
+            self.__encoder_profile,
+        )
 
-        calc_frame_process = Process(
-            target=calculate_frame_task,
-            daemon=True,
-            args=(
-                self.__is_recording,
-                self.__shared_memory,
-                self.__capture_area,
-            ),
+        pacer = self.__pacer
+        frame_ring = self.__frame_ring
+        last_seq = 0
+        last_tick = 0
+        refresh_ticks = round(HELD_FRAME_REFRESH_SECONDS * self.__fps)
+
+        print("Recording started")
+        while self.__is_recording.is_set():
+            due = pacer.wait()
+
+            # Only the sequence numbers of new frames go through the queue, the frames stay in the ring and the writer
+            # holds the previous frame on the ticks in between
+            frames = pacer.select_frames(frame_ring.latest(), due, frame_ring.timestamp)
+            first_tick = pacer.emitted_frames - len(frames)
+            for i, seq in enumerate(frames):
+                tick = first_tick + i
+                if seq != last_seq or tick - last_tick >= refresh_ticks:
+                    self.__enqueue(tick, seq)
+                    last_seq = seq
+                    last_tick = tick
+
+            self.__adapt_capture_rate()
+
+        # No more frames are coming, the writer pads the video up to the last tick
+        while True:
+            try:
+                self.__frame_queue.put((pacer.emitted_frames, None), timeout=0.1)
+                break
+            except queue.Full:
+                # Nobody would ever make room for it
+                if not worker_pool.is_busy(RecordingWorker.WRITER):
+                    print("The writer stopped before the end of the recording")
+                    break
+
+        worker_pool.wait_until_idle(RecordingWorker.CAPTURE)
+        worker_pool.wait_until_idle(RecordingWorker.WRITER)
+
+        print(
+            f"Recording stopped: {pacer.achieved_fps:.1f} fps achieved, "
+            f"{pacer.dropped_frames} frames dropped, {pacer.duplicated_frames} duplicated, "
+            f"{self.backpressure_drops} dropped by backpressure "
+            f"(queue depth peaked at {self.max_queue_depth}/{self.queue_capacity}), "
+            f"{self.unchanged_frames} grabs found the screen unchanged"
         )
-        save_frame_process = Process(
-            target=save_frame_task,
-            daemon=True,
-            args=(
-                self.__is_recording,
-                self.__frame_queue,
-                self.__shared_memory,
-                self.__filename,
-                self.__fourcc,
-                self.__fps,
-                self.__width,
-                self.__height,
-            ),
+
+    def __enqueue(self, tick: int, seq: int) -> None:
+        # The pool's queue is sized for any recording, this one may hold less
+        if self.queue_depth < self.queue_capacity:
+            try:
+                self.__frame_queue.put_nowait((tick, seq))
+                self.__last_enqueued_tick = tick
+                return
+            except queue.Full:
+                pass
+
+        # The writer is a whole queue behind
+        self.backpressure_drops += 1
+        if self.__backpressure_policy == BackpressurePolicy.DROP_OLDEST:
+            try:
+                self.__frame_queue.get_nowait()
+                self.__frame_queue.put_nowait((tick, seq))
+                self.__last_enqueued_tick = tick
+            except (queue.Empty, queue.Full):
+                pass  # the writer took it first, or it is not flushed yet: the new frame is dropped instead
+
+    def __adapt_capture_rate(self) -> None:
+        depth = self.queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        if self.__backpressure_policy != BackpressurePolicy.DEGRADE:
+            return
+
+        # Halve the capture rate when the queue is filling up, double it again once the writer has kept up for a
+        # while. Changes are at least half a second apart so the queue has time to react.
+        assert self.__pacer is not None
+        tick = self.__pacer.emitted_frames
+        if tick - self.__last_divider_change < self.__fps / 2:
+            return
+
+        divider = self.__shared.capture_divider.value
+        if depth >= self.queue_capacity * 3 // 4 and divider < MAX_CAPTURE_DIVIDER:
+            divider *= 2
+        elif depth <= self.queue_capacity // 4 and divider > 1:
+            divider //= 2
+        else:
+            return
+
+        self.__shared.capture_divider.value = divider
+        self.__last_divider_change = tick
+        print(
+            f"Frame queue at {depth}/{self.queue_capacity}, grabbing every {divider} frames"
         )
 
-        processes.append(calc_frame_process)
-        processes.append(save_frame_process)
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of frames waiting to be written.
 
-        calc_frame_process.start()
-        save_frame_process.start()
+        :return: The queue depth, 0 where the platform cannot tell
+        :rtype: int
+        """
+        try:
+            return self.__frame_queue.qsize()
+        except NotImplementedError:  # macOS
+            return 0
 
-        queue = self.__frame_queue
-        interval = math.floor(1000 / self.__fps)
-        previous_frame_time = math.floor(time.time() * 1000)
-        new_frame_time = None
+    @property
+    def overwritten_frames(self) -> int:
+        """
+        The number of frames the writer found overwritten in the ring, and replaced with the previous frame.
 
-        print("Recording started")
-        while self.__is_recording.is_set():
-            latest_frame = self.__shared_memory.get("latest_frame")
+        :return: The number of frames
+        :rtype: int
+        """
+        return self.__shared.overwritten_frames.value
 
-            if latest_frame is not None and (
-                new_frame_time is None
-                or new_frame_time - previous_frame_time >= interval
-            ):
-                new_frame_time = math.floor(time.time() * 1000)
-                fps = 1000 / (new_frame_time - previous_frame_time)
+    @property
+    def unchanged_frames(self) -> int:
+        """
+        The number of grabs that found the screen as it was, and were not published.
+
+        :return: The number of grabs
+        :rtype: int
+        """
+        return self.__shared.unchanged_frames.value
+
+    @property
+    def duration(self) -> float:
+        """
+        The duration of the recorded video.
+
+        :return: The duration, in seconds
+        :rtype: float
+        """
+        return self.__shared.total_frames.value / self.__fps
+
+    @property
+    def achieved_fps(self) -> float:
+        """
+        The rate of new frames that made it into the video, 0 if the recording has not started.
+
+        :return: The achieved frame rate
+        :rtype: float
+        """
+        pacer = self.__pacer
+        if pacer is None or pacer.emitted_frames == 0:
+            return 0.0
+
+        # Per second of video rather than of wall clock, so it holds once the recording is over
+        return pacer.unique_frames * self.__fps / pacer.emitted_frames
+
+    @property
+    def encoder_lag(self) -> float:
+        """
+        How far the writer is behind the recording, because the encoder or the disk cannot keep up.
 
-                # Adjust interval based on the current FPS
-                if fps < self.__fps and interval > 1:
-                    interval -= 1
-                elif fps > self.__fps and interval < 1000:
-                    interval += 1
+        The latest frame handed to the writer is compared with the last one it is done with. The ticks after the latest
+        frame do not count, the writer has nothing to do for them but hold that frame.
 
-                # print(f"FPS: {int(fps)}")
-                previous_frame_time = new_frame_time
-                queue.put(latest_frame)
-            else:
-                new_frame_time = math.floor(time.time() * 1000)
+        :return: The lag, in seconds of video
+        :rtype: float
+        """
+        behind = self.__last_enqueued_tick - self.__shared.total_frames.value
+        return max(0, behind) / self.__fps
 
-        calc_frame_process.join()
-        processes.remove(calc_frame_process)
-        save_frame_process.join()
-        processes.remove(save_frame_process)
+    def telemetry(self) -> dict:
+        """
+        The figures of the recording so far. The frame rates and the grab lateness are over the time since the
+        previous call, the frame counts since the start.
 
-        print("Recording stopped")
+        :return: The figures, by name
+        :rtype: dict
+        """
+        pacer = self.__pacer
+        if pacer is None:
+            return {}
+
+        # In seconds of video, which stops with the recording
+        elapsed = pacer.emitted_frames / self.__fps
+        grabbed_frames = self.__shared.grabbed_frames.value
+        last_elapsed, last_grabbed_frames, last_unique_frames = self.__last_sample
+        self.__last_sample = (elapsed, grabbed_frames, pacer.unique_frames)
+        interval = elapsed - last_elapsed
+        if interval <= 0:
+            interval = math.inf
+
+        # How far off its deadline the capture worker grabbed, what makes the motion look uneven
+        grab_lateness = self.__shared.grab_lateness
+        with grab_lateness.get_lock():
+            max_grab_lateness = grab_lateness.value
+            grab_lateness.value = 0
+
+        return {
+            "capture_fps": round((grabbed_frames - last_grabbed_frames) / interval, 1),
+            "fps": round((pacer.unique_frames - last_unique_frames) / interval, 1),
+            "dropped_frames": pacer.dropped_frames,
+            "duplicated_frames": pacer.duplicated_frames,
+            "grab_lateness_ms": round(max_grab_lateness / 1_000_000, 1),
+            "unchanged_frames": self.unchanged_frames,
+            "backpressure_drops": self.backpressure_drops,
+            "overwritten_frames": self.overwritten_frames,
+            "queue_depth": self.queue_depth,
+            "capture_divider": self.__shared.capture_divider.value,
+            "encoder_lag": round(self.encoder_lag, 2),
+        }
 
 
 class AudioRecorder:
     def __init__(
         self,
+        worker_pool: RecordingWorkerPool,
         filename: str,
         channels: int = 2,
         rate: int = 44100,
         chunk: int = 1024,
     ) -> None:
+        self.__worker_pool = worker_pool
+        self.__shared = worker_pool.shared
         self.__filename = filename
         self.__channels = channels
         self.__rate = rate
         self.__chunk = chunk
-        self.__is_recording = multiprocessing.Event()
+        self.__is_recording = self.__shared.is_recording_audio
 
     async def start(self) -> None:
         if self.__is_recording.is_set():
             return
+
+        self.__worker_pool.wait_until_idle(RecordingWorker.AUDIO)
+        self.__shared.reset_audio()
         self.__is_recording.set()
 
-        self.__record_audio_process = Process(
-            target=record_audio_task,
-            daemon=True,
-            args=(
-                self.__is_recording,
-                self.__filename,
-                self.__channels,
-                self.__rate,
-                self.__chunk,
-            ),
+        self.__worker_pool.submit(
+            RecordingWorker.AUDIO,
+            record_audio_task,
+            self.__filename,
+            self.__channels,
+            self.__rate,
+            self.__chunk,
         )
-        processes.append(self.__record_audio_process)
-        self.__record_audio_process.start()
 
     async def stop(self) -> None:
         if not self.__is_recording.is_set():
             return
 
         self.__is_recording.clear()
-
-        if self.__record_audio_process and self.__record_audio_process.is_alive():
-            self.__record_audio_process.join()
-            processes.remove(self.__record_audio_process)
+        self.__worker_pool.wait_until_idle(RecordingWorker.AUDIO)
 
         print("Audio recording stopped")
 
+    @property
+    def start_time(self) -> int:
+        """
+        When the first sample was recorded, on the monotonic clock. 0 if nothing has been recorded.
+
+        :return: The start time, in nanoseconds
+        :rtype: int
+        """
+        return self.__shared.audio_start_time.value
+
+    def telemetry(self) -> dict:
+        """
+        The figures of the recording so far.
+
+        :return: The figures, by name
+        :rtype: dict
+        """
+        return {
+            "audio_dropped_chunks": self.__shared.dropped_chunks.value,
+            "audio_input_overflows": self.__shared.input_overflows.value,
+        }
+
 
 class StopBtnWrapper(QWidget):
-    def __init__(self, stop_event: Callable[[], None]):
+    def __init__(self, stop_event: Callable[[], None], show_telemetry: bool = False):
         super().__init__()
 
         # UI setup
@@ -494,6 +1524,42 @@ class StopBtnWrapper(QWidget):
         self.stop_button.raise_()
         self.stop_button.show()
 
+        # Live telemetry of the recording, under the button
+        self.telemetry_label = QLabel(self)
+        self.telemetry_label.setStyleSheet(
+            """
+            QLabel {
+                background-color: rgba(0, 0, 0, 160);
+                color: white;
+                font-size: 11px;
+                border-radius: 4px;
+                padding: 2px 4px;
+            }
+        """
+        )
+        self.telemetry_label.setGeometry(5, 55, 330, 20)
+        self.telemetry_label.setVisible(show_telemetry)
+        self.__show_telemetry = show_telemetry
+
+    def set_telemetry(self, sample: dict) -> None:
+        """
+        Show the latest telemetry of the recording, if enabled.
+
+        :param dict sample: The figures, as recorded in the telemetry of the recording
+        :return: None
+        """
+        if not self.__show_telemetry:
+            return
+
+        self.telemetry_label.setText(
+            f"{sample.get('fps', 0):.0f}/{sample.get('capture_fps', 0):.0f} fps | "
+            f"drop {sample.get('dropped_frames', 0) + sample.get('backpressure_drops', 0)} "
+            f"dup {sample.get('duplicated_frames', 0)} | "
+            f"queue {sample.get('queue_depth', 0)} | "
+            f"lag {sample.get('encoder_lag', 0):.1f}s | "
+            f"audio {sample.get('audio_dropped_chunks', 0) + sample.get('audio_input_overflows', 0)}"
+        )
+
     def mousePressEvent(self, a0: Optional[QMouseEvent]) -> None:
         assert a0 is not None
         self.__mouse_move_pos = None
@@ -1,6 +1,6 @@
 from enum import Enum
-from typing import Callable, Optional, Tuple
-from PyQt6.QtCore import QPoint, QPointF
+from typing import Callable, List, Optional, Tuple
+from PyQt6.QtCore import QPoint, QPointF, QRectF
 from PyQt6.QtGui import QColor, QImage, QPixmap, QResizeEvent
 from PyQt6.QtWidgets import QVBoxLayout, QWidget
 
@@ -242,6 +242,31 @@ class Viewer(QWidget):
         elif self.mode == Mode.VIDEO:
             raise Exception("Cannot set pixmap in video mode")
 
+    def get_displayed_image(self) -> Tuple[QImage, float] | None:
+        """
+        Get the image as it is displayed, scaled and zoomed. Only works in image mode.
+
+        :return: The displayed image and its scale relative to the original pixmap
+        :rtype: Tuple[QImage, float] | None
+        """
+        if self.mode == Mode.IMAGE:
+            return self.__image_viewer.get_displayed_image()
+        elif self.mode == Mode.VIDEO:
+            raise Exception("Cannot get displayed image in video mode")
+
+    def set_previews(self, previews: List[Tuple[QImage, QRectF]]) -> None:
+        """
+        Show images above parts of the displayed image, without changing the pixmap. Only works in image mode.
+
+        :param previews: The images and where to show them, in the coordinates of the original pixmap
+        :type previews: List[Tuple[QImage, QRectF]]
+        :return: None
+        """
+        if self.mode == Mode.IMAGE:
+            self.__image_viewer.set_previews(previews)
+        elif self.mode == Mode.VIDEO:
+            raise Exception("Cannot set previews in video mode")
+
     def set_video(self, video_path: str) -> None:
         """
         Set the video to be played. Only works in video mode.
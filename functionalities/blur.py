@@ -1,9 +1,14 @@
 from enum import Enum
+from typing import List, Tuple
 from PyQt6.QtCore import QRect
 from PyQt6.QtGui import QImage
 import cv2
 import numpy as np
 
+from functionalities.image_bridge import CHANNELS, FALLBACK_FORMAT, qimage_as_array
+
+DEFAULT_BLUR_RADIUS = 10
+
 
 class BlurMode(Enum):
     PIXELATE = 0
@@ -11,102 +16,203 @@ class BlurMode(Enum):
     GAUSSIAN = 2
 
 
-def __qimage_to_cv2(qimage: QImage) -> np.ndarray:
-    """Convert QImage to OpenCV format"""
-    width = qimage.width()
-    height = qimage.height()
-
-    # Convert QImage to byte string
-    ptr = qimage.bits()
-    assert ptr is not None
-    ptr.setsize(height * width * 4)
-    arr = np.array(ptr).reshape(height, width, 4)  # 4 for RGBA
+class BlurShape(Enum):
+    RECTANGLE = 0
+    ELLIPSE = 1
 
-    # Convert RGBA to BGR (OpenCV format)
-    return cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
 
+class BlurRegion:
+    """
+    A region of an image to blur, and how.
+    """
 
-def __cv2_to_qimage(cv_img: np.ndarray) -> QImage:
-    """Convert OpenCV image to QImage"""
-    height, width = cv_img.shape[:2]
-    data = cv_img.data.tobytes()
-
-    # Create QImage from numpy array
-    return QImage(data, width, height, width * 3, QImage.Format.Format_RGB888)
+    def __init__(
+        self,
+        rect: QRect,
+        blur_mode: BlurMode = BlurMode.MOSAIC,
+        blur_shape: BlurShape = BlurShape.RECTANGLE,
+        blur_radius: int = DEFAULT_BLUR_RADIUS,
+    ) -> None:
+        """
+        :param QRect rect: The region, in the coordinates of the image
+        :param BlurMode blur_mode: How to blur it
+        :param BlurShape blur_shape: The shape blurred within the region
+        :param int blur_radius: The strength of the blur, in pixels
+        """
+        self.rect = rect
+        self.blur_mode = blur_mode
+        self.blur_shape = blur_shape
+        self.blur_radius = blur_radius
 
 
 def apply_blur_effect(
-    image: QImage, rect: QRect, blur_mode: BlurMode = BlurMode.MOSAIC
+    image: QImage,
+    rect: QRect,
+    blur_mode: BlurMode = BlurMode.MOSAIC,
+    blur_shape: BlurShape = BlurShape.RECTANGLE,
+    blur_radius: int = DEFAULT_BLUR_RADIUS,
 ) -> QImage:
-    # Convert QPixmap to OpenCV format
-    cv_image = __qimage_to_cv2(image)
-
-    # Normalize rectangle and ensure it's within image bounds
-    rect = rect.normalized()
-    rect = QRect(
-        max(0, rect.x()),
-        max(0, rect.y()),
-        min(rect.width(), cv_image.shape[1] - rect.x()),
-        min(rect.height(), cv_image.shape[0] - rect.y()),
+    """
+    Blur a region of an image, in place. Only the pixels of the region are touched, and the image keeps its format.
+
+    :param QImage image: The image to blur
+    :param QRect rect: The region to blur, clipped to the image
+    :param BlurMode blur_mode: How to blur it
+    :param BlurShape blur_shape: The shape blurred within the region
+    :param int blur_radius: The strength of the blur, in pixels
+    :return: The image
+    :rtype: QImage
+    """
+    return apply_blur_effects(
+        image, [BlurRegion(rect, blur_mode, blur_shape, blur_radius)]
     )
 
-    # Create a mask for the blur shape
-    mask = np.zeros(cv_image.shape[:2], dtype=np.uint8)
 
-    cv2.rectangle(
-        mask,
-        (rect.x(), rect.y()),
-        (rect.x() + rect.width(), rect.y() + rect.height()),
-        255,
-        -1,
-    )
+def apply_blur_effects(image: QImage, regions: List[BlurRegion]) -> QImage:
+    """
+    Blur many regions of an image at once, in place. The image is viewed as an array, and converted if its format
+    needs it, a single time for all the regions.
+
+    :param QImage image: The image to blur
+    :param regions: The regions to blur, clipped to the image. Overlapping regions are blurred in order.
+    :type regions: List[BlurRegion]
+    :return: The image
+    :rtype: QImage
+    """
+    if image.isNull() or not regions:
+        return image
+
+    image_format = image.format()
+    if image_format not in CHANNELS:
+        image.convertTo(FALLBACK_FORMAT)
+
+    pixels = qimage_as_array(image)
+    for region in regions:
+        rect = region.rect.normalized().intersected(image.rect())
+        if rect.isEmpty():
+            continue
+
+        roi = pixels[rect.top() : rect.bottom() + 1, rect.left() : rect.right() + 1]
+        blurred = __blur_region(pixels, rect, region.blur_mode, region.blur_radius)
+
+        # Apply the selected effect only to the shape
+        if region.blur_shape == BlurShape.RECTANGLE:
+            roi[:] = blurred
+        elif region.blur_shape == BlurShape.ELLIPSE:
+            np.copyto(roi, blurred, where=__ellipse_mask(roi.shape[:2]))
+
+    del pixels  # the view must not outlive the image it is converted back from
+    if image.format() != image_format:
+        image.convertTo(image_format)
+
+    return image
+
+
+def __blur_region(
+    pixels: np.ndarray, rect: QRect, blur_mode: BlurMode, blur_radius: int
+) -> np.ndarray:
+    """
+    :param pixels: The whole image, shaped (height, width, channels)
+    :param QRect rect: The region to blur, within the image
+    :param BlurMode blur_mode: How to blur it
+    :param int blur_radius: The strength of the blur, in pixels
+    :return: The blurred pixels of the region, the image is left as is
+    :rtype: np.ndarray
+    """
+    roi = pixels[rect.top() : rect.bottom() + 1, rect.left() : rect.right() + 1]
 
-    # Apply the selected effect only to the masked area
     if blur_mode == BlurMode.PIXELATE:
-        raise NotImplementedError("Pixelate blur not implemented")
+        return __pixelate(roi, blur_radius)
     elif blur_mode == BlurMode.MOSAIC:
-        __apply_mosaic_effect(cv_image, rect)
+        mosaic = roi.copy()
+        __apply_mosaic_effect(mosaic, blur_radius)
+        return mosaic
     elif blur_mode == BlurMode.GAUSSIAN:
-        raise NotImplementedError("Gaussian blur not implemented")
+        return __gaussian_blur(pixels, rect, blur_radius)
 
-    # Convert back to QPixmap
-    qimage = __cv2_to_qimage(cv_image)
-    return qimage
+    raise ValueError(f"Unknown blur mode {blur_mode}")
 
 
-def __apply_mosaic_effect(
-    image: np.ndarray, rect: QRect, blur_radius: int = 10
-) -> None:
+def __ellipse_mask(size: Tuple[int, int]) -> np.ndarray:
+    """
+    :param size: The height and width of the region
+    :type size: Tuple[int, int]
+    :return: Which pixels of the region are in the ellipse inscribed in it, shaped (height, width, 1)
+    :rtype: np.ndarray
     """
-    Apply a mosaic effect to the image within the specified rectangle.
+    h, w = size
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.ellipse(mask, (((w - 1) / 2, (h - 1) / 2), (w, h), 0), 1, -1)
+    return mask.astype(bool)[:, :, np.newaxis]
 
-    :param image: The image to apply the effect to.
-    :param rect: The rectangle specifying the region of interest (ROI).
+
+def __pixelate(roi: np.ndarray, blur_radius: int) -> np.ndarray:
+    """
+    :param roi: The pixels of the region, shaped (height, width, channels)
+    :param int blur_radius: The size of the blocks
+    :return: The region as blocks of color, resized down and back up
+    :rtype: np.ndarray
     """
-    x, y, w, h = rect.x(), rect.y(), rect.width(), rect.height()
-    if w <= 0 or h <= 0:
-        return
+    h, w = roi.shape[:2]
+    block_size = max(1, blur_radius)
 
-    # Extract ROI
-    x = max(0, min(x, image.shape[1] - 1))
-    y = max(0, min(y, image.shape[0] - 1))
-    w = min(w, image.shape[1] - x)
-    h = min(h, image.shape[0] - y)
+    small = cv2.resize(
+        roi,
+        (max(1, w // block_size), max(1, h // block_size)),
+        interpolation=cv2.INTER_LINEAR,
+    )
+    return cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST)
 
-    if w <= 0 or h <= 0:
-        return
 
-    roi = image[y : y + h, x : x + w]
+def __gaussian_blur(pixels: np.ndarray, rect: QRect, blur_radius: int) -> np.ndarray:
+    """
+    Blur a region as if the whole image had been blurred, from the region and the margin the kernel reaches around it.
+
+    :param pixels: The whole image, shaped (height, width, channels)
+    :param QRect rect: The region to blur, within the image
+    :param int blur_radius: The radius of the kernel
+    :return: The blurred pixels of the region
+    :rtype: np.ndarray
+    """
+    kernel_size = blur_radius * 2 + 1  # Must be odd
+    image_h, image_w = pixels.shape[:2]
+    top = max(0, rect.top() - blur_radius)
+    left = max(0, rect.left() - blur_radius)
+    bottom = min(image_h, rect.bottom() + 1 + blur_radius)
+    right = min(image_w, rect.right() + 1 + blur_radius)
+
+    # Cut short at the edges of the image, where the kernel reflects the image as it would on the whole of it
+    blurred = cv2.GaussianBlur(
+        pixels[top:bottom, left:right], (kernel_size, kernel_size), 0
+    )
+    y, x = rect.top() - top, rect.left() - left
+    return blurred[y : y + rect.height(), x : x + rect.width()]
+
+
+def __apply_mosaic_effect(
+    roi: np.ndarray, blur_radius: int = DEFAULT_BLUR_RADIUS
+) -> None:
+    """
+    Apply a mosaic effect to a region of interest (ROI), in place.
+
+    :param roi: The pixels of the region, shaped (height, width, channels)
+    """
+    h, w = roi.shape[:2]
 
     # Calculate tile size
     tile_size = max(2, blur_radius * 2)
 
-    # Create mosaic effect
-    for i in range(0, h, tile_size):
-        for j in range(0, w, tile_size):
-            tile_h = min(tile_size, h - i)
-            tile_w = min(tile_size, w - j)
-            if tile_h > 0 and tile_w > 0:
-                tile = roi[i : i + tile_h, j : j + tile_w]
-                color = cv2.mean(tile)[:3]  # Get average color
-                roi[i : i + tile_h, j : j + tile_w] = color
+    # Create mosaic effect, all the tiles at once: the last row and column of tiles may be smaller
+    rows = np.append(np.arange(0, h, tile_size), h)
+    cols = np.append(np.arange(0, w, tile_size), w)
+    # The sum of each tile from the sums of all the pixels above and left of its corners, 32 bits are enough up to 4K
+    depth = cv2.CV_32S if w * h * 255 < 2**31 else cv2.CV_64F
+    corner_sums = cv2.integral(roi, sdepth=depth)[np.ix_(rows, cols)]
+    sums = np.diff(np.diff(corner_sums, axis=0), axis=1)
+    # Scaled by the inverse of the pixel count and truncated, as cv2.mean() then the assignment of each tile did
+    tile_heights = np.diff(rows)
+    tile_widths = np.diff(cols)
+    pixel_counts = np.outer(tile_heights, tile_widths)[:, :, np.newaxis]
+    colors = (sums * (1.0 / pixel_counts)).astype(np.uint8)
+    # Widened first, so the tall repeat copies whole rows
+    roi[:] = np.repeat(np.repeat(colors, tile_widths, axis=1), tile_heights, axis=0)
@@ -0,0 +1,175 @@
+import math
+import os
+from typing import Dict
+
+# x264 gains next to nothing past this many threads, and each one costs memory
+MAX_ENCODER_THREADS = 16
+
+
+def encoder_threads(reserved: int = 1) -> int:
+    """
+    Size the thread count of an encoder from the number of cores and how busy they already are.
+
+    :param int reserved: Cores left to the rest of the app (the UI, the capture...)
+    :return: The number of threads, at least 1
+    :rtype: int
+    """
+    available = (os.cpu_count() or 1) - reserved
+    if hasattr(os, "getloadavg"):  # not on Windows
+        # The 1 minute load average is about how many cores are kept busy by other processes
+        available -= math.floor(os.getloadavg()[0])
+
+    return max(1, min(available, MAX_ENCODER_THREADS))
+
+
+def to_args(options: Dict[str, str]) -> list:
+    """
+    Turn ffmpeg options, as given to ffmpeg-python, into command line arguments.
+
+    :param options: The options, by name without the leading dash
+    :type options: Dict[str, str]
+    :return: The arguments
+    :rtype: list
+    """
+    args = []
+    for key, value in options.items():
+        args += [f"-{key}", value]
+
+    return args
+
+
+class EncoderProfile:
+    """
+    How a video is encoded: the codecs and the trade-off between speed, size and quality.
+
+    A profile only describes the encoding, it gives the same ffmpeg options to the raw commands (see to_args()) and to
+    ffmpeg-python.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        video_codec: str,
+        preset: str,
+        pixel_format: str,
+        gop_seconds: float,
+        crf: int | None = None,
+        video_bitrate: str | None = None,
+        audio_codec: str = "aac",
+        audio_bitrate: str | None = "128k",
+        extra_video_options: Dict[str, str] | None = None,
+    ) -> None:
+        """
+        :param str name: The name the profile is known by
+        :param str video_codec: The ffmpeg video encoder
+        :param str preset: The encoder preset, the slower the smaller the file
+        :param str pixel_format: The pixel format of the encoded video
+        :param float gop_seconds: The longest time between two keyframes, i.e. the seeking granularity
+        :param crf: The constant quality to aim for, lower is better
+        :type crf: int or None
+        :param video_bitrate: The bitrate to aim for instead of a constant quality, e.g. `8M`
+        :type video_bitrate: str or None
+        :param str audio_codec: The ffmpeg audio encoder
+        :param audio_bitrate: The audio bitrate, None for lossless codecs
+        :type audio_bitrate: str or None
+        :param extra_video_options: Other options of the video encoder
+        :type extra_video_options: Dict[str, str] or None
+        """
+        self.name = name
+        self.video_codec = video_codec
+        self.preset = preset
+        self.pixel_format = pixel_format
+        self.gop_seconds = gop_seconds
+        self.crf = crf
+        self.video_bitrate = video_bitrate
+        self.audio_codec = audio_codec
+        self.audio_bitrate = audio_bitrate
+        self.extra_video_options = extra_video_options or {}
+
+    def video_options(self, threads: int | None = None) -> Dict[str, str]:
+        """
+        The ffmpeg output options encoding the video.
+
+        :param threads: The number of encoder threads, sized from the load of the machine if None
+        :type threads: int or None
+        :return: The options, by name without the leading dash
+        :rtype: Dict[str, str]
+        """
+        options = {
+            "c:v": self.video_codec,
+            "preset": self.preset,
+            "pix_fmt": self.pixel_format,
+            # Keyframes by time, so the interval does not depend on the frame rate
+            "force_key_frames": f"expr:gte(t,n_forced*{self.gop_seconds})",
+            "threads": str(encoder_threads() if threads is None else threads),
+        }
+        if self.crf is not None:
+            options["crf"] = str(self.crf)
+        if self.video_bitrate is not None:
+            options["b:v"] = self.video_bitrate
+
+        return {**options, **self.extra_video_options}
+
+    def audio_options(self) -> Dict[str, str]:
+        """
+        The ffmpeg output options encoding the audio.
+
+        :return: The options, by name without the leading dash
+        :rtype: Dict[str, str]
+        """
+        options = {"c:a": self.audio_codec}
+        if self.audio_bitrate is not None:
+            options["b:a"] = self.audio_bitrate
+
+        return options
+
+
+# Keeps up with recording: what the frames are encoded with while they are captured
+REALTIME_PROFILE = EncoderProfile(
+    "realtime", "libx264", "veryfast", "yuv420p", gop_seconds=2, crf=23
+)
+BALANCED_PROFILE = EncoderProfile(
+    "balanced", "libx264", "medium", "yuv420p", gop_seconds=5, crf=23
+)
+# H.265 at about half the size of H.264, much slower to encode
+SMALL_FILE_PROFILE = EncoderProfile(
+    "small-file",
+    "libx265",
+    "medium",
+    "yuv420p",
+    gop_seconds=10,
+    crf=28,
+    audio_bitrate="96k",
+    extra_video_options={"tag:v": "hvc1"},  # or Apple players refuse it
+)
+# Every pixel kept, at a large size. 4:4:4 so the colors are not subsampled.
+LOSSLESS_PROFILE = EncoderProfile(
+    "lossless",
+    "libx264",
+    "ultrafast",
+    "yuv444p",
+    gop_seconds=2,
+    crf=0,
+    audio_codec="alac",
+    audio_bitrate=None,
+)
+
+ENCODER_PROFILES = {
+    profile.name: profile
+    for profile in (
+        REALTIME_PROFILE,
+        BALANCED_PROFILE,
+        SMALL_FILE_PROFILE,
+        LOSSLESS_PROFILE,
+    )
+}
+
+
+def get_encoder_profile(name: str | None) -> EncoderProfile:
+    """
+    :param name: The name of a profile
+    :type name: str or None
+    :return: The profile, BALANCED_PROFILE if there is none by that name
+    :rtype: EncoderProfile
+    """
+    return ENCODER_PROFILES.get(name or "", BALANCED_PROFILE)
@@ -0,0 +1,163 @@
+import time
+from typing import Callable, List
+
+NANOSECONDS_PER_SECOND = 1_000_000_000
+
+
+class FramePacer:
+    """
+    Paces a loop at a fixed frame rate.
+
+    Tick `n` is due at the absolute deadline `start_time + (n + phase) * interval` of the monotonic clock, so waking up
+    late never shifts the following deadlines and the schedule does not drift. Waiting is a plain sleep until the
+    deadline, no CPU is burnt in between.
+
+    The pacer also decides which captured frame fills each due tick (see select_frames()), keeping count of the frames
+    it had to drop or duplicate to stay on schedule.
+    """
+
+    def __init__(
+        self, fps: float, start_time: int | None = None, phase: float = 0.0
+    ) -> None:
+        """
+        :param float fps: The target frame rate
+        :param start_time: The time of tick 0, in nanoseconds of the monotonic clock. Now if None. Pacers sharing the
+            same start time share the same schedule, even across processes.
+        :type start_time: int or None
+        :param float phase: Offset of the deadlines, as a fraction of the frame interval
+        """
+        self.fps = fps
+        self.interval = round(NANOSECONDS_PER_SECOND / fps)
+        self.start_time = time.monotonic_ns() if start_time is None else start_time
+        self.__origin = self.start_time + round(phase * self.interval)
+        self.__next_tick = 0
+
+        self.__last_seq = 0
+        self.__pending_ticks = 0
+        self.emitted_frames = 0
+        self.unique_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+
+    def wait(self) -> int:
+        """
+        Block until the next deadline.
+
+        :return: The number of ticks that are due, more than 1 if the previous ones were missed
+        :rtype: int
+        """
+        deadline = self.__origin + self.__next_tick * self.interval
+        now = time.monotonic_ns()
+        if now < deadline:
+            time.sleep((deadline - now) / NANOSECONDS_PER_SECOND)
+            now = max(time.monotonic_ns(), deadline)
+
+        last_due_tick = (now - self.__origin) // self.interval
+        due = last_due_tick - self.__next_tick + 1
+        self.__next_tick = last_due_tick + 1
+
+        return due
+
+    def lateness(self, timestamp: int) -> int:
+        """
+        Tell how long after the deadline of the latest due tick something happened, e.g. a frame was grabbed.
+
+        :param int timestamp: When it happened, in nanoseconds of the monotonic clock
+        :return: How late it was, in nanoseconds
+        :rtype: int
+        """
+        return timestamp - (self.__origin + (self.__next_tick - 1) * self.interval)
+
+    def select_frames(
+        self,
+        latest_seq: int,
+        due: int,
+        timestamp_of: Callable[[int], int | None] | None = None,
+    ) -> List[int]:
+        """
+        Decide which frames fill the due ticks, given the sequence number of the latest captured frame.
+
+        Each tick gets exactly one frame, so the output keeps the target frame rate. When the capture timestamps are
+        known, a tick gets the newest frame captured before its deadline, otherwise the latest frame goes to the last
+        due tick. Ticks without a new frame repeat the previous frame (duplicated). Frames that were captured in
+        between but never got a tick are dropped.
+
+        :param int latest_seq: The sequence number of the latest captured frame, 0 if none has been captured yet
+        :param int due: The number of due ticks, as returned by wait()
+        :param timestamp_of: Returns the capture timestamp of a frame, None if it is not known anymore
+        :type timestamp_of: Callable[[int], int | None] | None
+        :return: The sequence number of the frame for each due tick, in order
+        :rtype: List[int]
+        """
+        if latest_seq <= 0:
+            # Nothing to show yet, the first frame will fill these ticks
+            self.__pending_ticks += due
+            return []
+
+        due += self.__pending_ticks
+        self.__pending_ticks = 0
+        first_tick = self.__next_tick - due
+
+        frames = []
+        for i in range(due):
+            if timestamp_of is None:
+                seq = latest_seq if i == due - 1 else self.__last_seq
+            else:
+                seq = self.__newest_frame_before(
+                    latest_seq,
+                    self.__origin + (first_tick + i) * self.interval,
+                    timestamp_of,
+                )
+
+            if seq == 0:
+                # Before the very first frame there is nothing to repeat, so it fills the tick itself
+                seq = latest_seq
+
+            if seq > self.__last_seq:
+                if self.__last_seq > 0:
+                    self.dropped_frames += seq - self.__last_seq - 1
+                self.unique_frames += 1
+                self.__last_seq = seq
+            else:
+                seq = self.__last_seq
+                self.duplicated_frames += 1
+
+            frames.append(seq)
+
+        self.emitted_frames += due
+        return frames
+
+    def __newest_frame_before(
+        self,
+        latest_seq: int,
+        deadline: int,
+        timestamp_of: Callable[[int], int | None],
+    ) -> int:
+        for seq in range(latest_seq, self.__last_seq, -1):
+            timestamp = timestamp_of(seq)
+            if timestamp is None:  # older frames are gone as well
+                break
+            if timestamp <= deadline:
+                return seq
+
+        return self.__last_seq
+
+    def elapsed(self) -> float:
+        """
+        Return the time since tick 0.
+
+        :return: The elapsed time, in seconds
+        :rtype: float
+        """
+        return max(0, time.monotonic_ns() - self.start_time) / NANOSECONDS_PER_SECOND
+
+    @property
+    def achieved_fps(self) -> float:
+        """
+        The rate of new (not duplicated) frames since tick 0.
+
+        :return: The achieved frame rate
+        :rtype: float
+        """
+        elapsed = self.elapsed()
+        return self.unique_frames / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,189 @@
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import os
+from typing import Tuple
+import numpy as np
+
+# Frames start on a cache line boundary after the headers
+HEADER_ALIGNMENT = 64
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of frames living in shared memory, written by one process and read by any number of others.
+
+    Every slot carries the sequence number and the capture timestamp (monotonic clock, in nanoseconds) of the frame it
+    holds. Frames are published in increasing sequence numbers starting at 1, frame `seq` always lives in slot
+    `seq % slot_count`. While a slot is being written its sequence number is set to -1, so a reader can tell whether the
+    frame it copied out was overwritten under its feet.
+
+    The buffer can be handed to another process as a Process argument (or pickled), which attaches to the same memory.
+    Only the creator should call unlink().
+    """
+
+    def __init__(
+        self,
+        slot_count: int,
+        frame_shape: Tuple[int, ...],
+        dtype: np.dtype | type = np.uint8,
+        name: str | None = None,
+    ) -> None:
+        """
+        Create a new ring buffer, or attach to an existing one.
+
+        :param int slot_count: The number of frames the ring holds
+        :param frame_shape: The shape of a single frame
+        :type frame_shape: Tuple[int, ...]
+        :param dtype: The data type of a frame
+        :param name: The name of the shared memory to attach to, None to create a new one
+        :type name: str or None
+        """
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+
+        frame_size = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        # The latest sequence number, then a (sequence number, timestamp) pair per slot
+        header_size = 8 * (1 + 2 * slot_count)
+        header_size = -(-header_size // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+        size = header_size + frame_size * slot_count
+
+        if name is None:
+            self.shared_memory = SharedMemory(create=True, size=size)
+        else:
+            self.shared_memory = SharedMemory(name=name)
+            if os.name == "posix":
+                # Attaching registers the memory as if it was created here, the tracker would then free it (or warn
+                # about a leak) when this process exits. It belongs to the creator.
+                resource_tracker.unregister(
+                    self.shared_memory._name, "shared_memory"  # type: ignore
+                )
+
+        buffer = self.shared_memory.buf
+        self.__latest = np.ndarray((1,), dtype=np.int64, buffer=buffer)
+        self.__headers = np.ndarray(
+            (slot_count, 2), dtype=np.int64, buffer=buffer, offset=8
+        )
+        self.__frames = np.ndarray(
+            (slot_count, *self.frame_shape),
+            dtype=self.dtype,
+            buffer=buffer,
+            offset=header_size,
+        )
+
+        if name is None:
+            self.__latest[0] = 0
+            self.__headers[:] = 0
+
+    def __getstate__(self) -> dict:
+        return {
+            "slot_count": self.slot_count,
+            "frame_shape": self.frame_shape,
+            "dtype": self.dtype.str,
+            "name": self.shared_memory.name,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def begin_write(self, seq: int) -> np.ndarray:
+        """
+        Claim the slot of a frame and invalidate its previous content.
+
+        :param int seq: The sequence number of the frame about to be written
+        :return: A writable view of the slot
+        :rtype: np.ndarray
+        """
+        slot = seq % self.slot_count
+        self.__headers[slot, 0] = -1
+        return self.__frames[slot]
+
+    def end_write(self, seq: int, timestamp: int) -> None:
+        """
+        Publish a frame previously claimed with begin_write().
+
+        :param int seq: The sequence number of the frame
+        :param int timestamp: The capture time of the frame, in nanoseconds of the monotonic clock
+        :return: None
+        """
+        slot = seq % self.slot_count
+        self.__headers[slot, 1] = timestamp
+        self.__headers[slot, 0] = seq
+        self.__latest[0] = seq
+
+    def write(self, seq: int, frame: np.ndarray, timestamp: int) -> None:
+        """
+        Copy a frame into the ring and publish it.
+
+        :param int seq: The sequence number of the frame
+        :param np.ndarray frame: The frame, must have the ring's frame shape
+        :param int timestamp: The capture time of the frame, in nanoseconds of the monotonic clock
+        :return: None
+        """
+        np.copyto(self.begin_write(seq), frame)
+        self.end_write(seq, timestamp)
+
+    def latest(self) -> int:
+        """
+        Return the sequence number of the most recently published frame, 0 if there is none yet.
+
+        :return: The sequence number
+        :rtype: int
+        """
+        return int(self.__latest[0])
+
+    def timestamp(self, seq: int) -> int | None:
+        """
+        Return the capture timestamp of a frame.
+
+        :param int seq: The sequence number of the frame
+        :return: The timestamp, or None if the frame is not in the ring (anymore)
+        :rtype: int or None
+        """
+        slot = seq % self.slot_count
+        timestamp = int(self.__headers[slot, 1])
+        if self.__headers[slot, 0] != seq:
+            return None
+
+        return timestamp
+
+    def read(self, seq: int, out: np.ndarray) -> int | None:
+        """
+        Copy a frame out of the ring.
+
+        :param int seq: The sequence number of the frame
+        :param np.ndarray out: Where to copy the frame to, must have the ring's frame shape
+        :return: The capture timestamp of the frame, or None if it is not in the ring (anymore). In that case the
+            content of `out` is unspecified.
+        :rtype: int or None
+        """
+        slot = seq % self.slot_count
+        if self.__headers[slot, 0] != seq:
+            return None
+
+        timestamp = int(self.__headers[slot, 1])
+        np.copyto(out, self.__frames[slot])
+
+        # The writer may have lapped us while copying
+        if self.__headers[slot, 0] != seq:
+            return None
+
+        return timestamp
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory.
+
+        :return: None
+        """
+        # The views must go before the mapping can be closed
+        self.__latest = self.__headers = self.__frames = None  # type: ignore
+        self.shared_memory.close()
+
+    def unlink(self) -> None:
+        """
+        Free the shared memory. Only the creator of the ring should call this, after every process is done with it.
+
+        :return: None
+        """
+        self.shared_memory.unlink()
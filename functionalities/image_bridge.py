@@ -0,0 +1,44 @@
+from PyQt6.QtGui import QImage
+import numpy as np
+
+# The formats that can be seen as an array, with their number of channels. The channels are in memory order: B, G, R, A
+# for the RGB32 and ARGB32 formats on a little-endian machine, R, G, B, A for the 8888 ones.
+CHANNELS = {
+    QImage.Format.Format_RGB32: 4,
+    QImage.Format.Format_ARGB32: 4,
+    QImage.Format.Format_ARGB32_Premultiplied: 4,
+    QImage.Format.Format_RGBX8888: 4,
+    QImage.Format.Format_RGBA8888: 4,
+    QImage.Format.Format_RGBA8888_Premultiplied: 4,
+    QImage.Format.Format_RGB888: 3,
+    QImage.Format.Format_BGR888: 3,
+}
+# What the other formats are worked on in
+FALLBACK_FORMAT = QImage.Format.Format_ARGB32
+
+
+def qimage_as_array(image: QImage) -> np.ndarray:
+    """
+    View the pixels of an image as an array, without copying them. Writing to the array modifies the image.
+
+    The image must outlive the array, and must not be modified through Qt while the array is used.
+
+    :param QImage image: The image, in one of the formats of CHANNELS
+    :return: The pixels, shaped (height, width, channels), with the row stride of the image
+    :rtype: np.ndarray
+    :raises ValueError: if the format of the image is not supported
+    """
+    channels = CHANNELS.get(image.format())
+    if channels is None:
+        raise ValueError(f"Cannot view a {image.format().name} image as an array")
+
+    height, width = image.height(), image.width()
+    bytes_per_line = image.bytesPerLine()
+    # Detaches the image from the pixmaps or images it shares its pixels with
+    ptr = image.bits()
+    assert ptr is not None
+    ptr.setsize(height * bytes_per_line)
+
+    # The rows are padded to bytes_per_line, the padding is left out of the view
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(height, bytes_per_line)
+    return rows[:, : width * channels].reshape(height, width, channels)
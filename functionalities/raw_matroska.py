@@ -0,0 +1,134 @@
+import numpy as np
+
+# Matroska element IDs, see https://www.matroska.org/technical/elements.html
+EBML = b"\x1a\x45\xdf\xa3"
+EBML_VERSION = b"\x42\x86"
+EBML_READ_VERSION = b"\x42\xf7"
+EBML_MAX_ID_LENGTH = b"\x42\xf2"
+EBML_MAX_SIZE_LENGTH = b"\x42\xf3"
+DOC_TYPE = b"\x42\x82"
+DOC_TYPE_VERSION = b"\x42\x87"
+DOC_TYPE_READ_VERSION = b"\x42\x85"
+SEGMENT = b"\x18\x53\x80\x67"
+INFO = b"\x15\x49\xa9\x66"
+TIMESTAMP_SCALE = b"\x2a\xd7\xb1"
+MUXING_APP = b"\x4d\x80"
+WRITING_APP = b"\x57\x41"
+TRACKS = b"\x16\x54\xae\x6b"
+TRACK_ENTRY = b"\xae"
+TRACK_NUMBER = b"\xd7"
+TRACK_UID = b"\x73\xc5"
+TRACK_TYPE = b"\x83"
+CODEC_ID = b"\x86"
+DEFAULT_DURATION = b"\x23\xe3\x83"
+VIDEO = b"\xe0"
+PIXEL_WIDTH = b"\xb0"
+PIXEL_HEIGHT = b"\xba"
+COLOUR_SPACE = b"\x2e\xb5\x24"
+CLUSTER = b"\x1f\x43\xb6\x75"
+TIMESTAMP = b"\xe7"
+SIMPLE_BLOCK = b"\xa3"
+
+# The FourCCs ffmpeg reads the pixel format of uncompressed video from
+FOURCCS = {
+    "bgra": b"BGRA",
+    "bgr24": b"BGR\x18",
+}
+# Timestamps are in microseconds
+TIMESTAMP_SCALE_NS = 1000
+# The size of an element whose end is only known once the stream is over
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+# Track 1, timestamp 0 relative to the cluster, keyframe
+SIMPLE_BLOCK_HEADER = b"\x81\x00\x00\x80"
+
+
+def __size(size: int) -> bytes:
+    # Always on 8 bytes, the frames are too big for the short forms to matter
+    return b"\x01" + size.to_bytes(7, "big")
+
+
+def __element(element_id: bytes, data: bytes) -> bytes:
+    return element_id + __size(len(data)) + data
+
+
+def __uint(element_id: bytes, value: int) -> bytes:
+    length = max(1, (value.bit_length() + 7) // 8)
+    return __element(element_id, value.to_bytes(length, "big"))
+
+
+def stream_header(width: int, height: int, fps: float, pixel_format: str) -> bytes:
+    """
+    The start of a Matroska stream of uncompressed frames, which ffmpeg reads with `-f matroska`.
+
+    Unlike `-f rawvideo`, every frame carries its own timestamp, so a frame can be shown for as long as needed without
+    being sent again.
+
+    :param int width: The width of the frames
+    :param int height: The height of the frames
+    :param float fps: The nominal frame rate, which the encoder picks its time base from
+    :param str pixel_format: The ffmpeg pixel format of the frames, one of FOURCCS
+    :return: The EBML header, the start of the segment and its tracks
+    :rtype: bytes
+    :raises ValueError: if the pixel format is not supported
+    """
+    fourcc = FOURCCS.get(pixel_format)
+    if fourcc is None:
+        raise ValueError(f"Cannot stream {pixel_format} frames in Matroska")
+
+    ebml = __element(
+        EBML,
+        __uint(EBML_VERSION, 1)
+        + __uint(EBML_READ_VERSION, 1)
+        + __uint(EBML_MAX_ID_LENGTH, 4)
+        + __uint(EBML_MAX_SIZE_LENGTH, 8)
+        + __element(DOC_TYPE, b"matroska")
+        + __uint(DOC_TYPE_VERSION, 4)
+        + __uint(DOC_TYPE_READ_VERSION, 2),
+    )
+    info = __element(
+        INFO,
+        __uint(TIMESTAMP_SCALE, TIMESTAMP_SCALE_NS)
+        + __element(MUXING_APP, b"Becap")
+        + __element(WRITING_APP, b"Becap"),
+    )
+    video = __element(
+        VIDEO,
+        __uint(PIXEL_WIDTH, width)
+        + __uint(PIXEL_HEIGHT, height)
+        + __element(COLOUR_SPACE, fourcc),
+    )
+    track = __element(
+        TRACK_ENTRY,
+        __uint(TRACK_NUMBER, 1)
+        + __uint(TRACK_UID, 1)
+        + __uint(TRACK_TYPE, 1)  # video
+        + __element(CODEC_ID, b"V_UNCOMPRESSED")
+        + __uint(DEFAULT_DURATION, round(1_000_000_000 / fps))
+        + video,
+    )
+
+    # The segment goes on until the stream is closed
+    return ebml + SEGMENT + UNKNOWN_SIZE + info + __element(TRACKS, track)
+
+
+def frame_header(timestamp: int, frame: np.ndarray) -> bytes:
+    """
+    What goes before a frame in the stream: each frame is a cluster of its own, holding a single block.
+
+    :param int timestamp: When the frame is shown, in microseconds
+    :param np.ndarray frame: The frame, written right after the header
+    :return: The header of the cluster and of its block
+    :rtype: bytes
+    """
+    cluster_timestamp = __uint(TIMESTAMP, timestamp)
+    block_size = len(SIMPLE_BLOCK_HEADER) + frame.nbytes
+    cluster_size = len(cluster_timestamp) + len(SIMPLE_BLOCK) + 8 + block_size
+
+    return (
+        CLUSTER
+        + __size(cluster_size)
+        + cluster_timestamp
+        + SIMPLE_BLOCK
+        + __size(block_size)
+        + SIMPLE_BLOCK_HEADER
+    )
@@ -0,0 +1,161 @@
+import json
+import os
+import platform
+import shutil
+import time
+from typing import List
+
+SESSION_FILE = "session.json"
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Tell whether a process is still running.
+
+    :param int pid: The id of the process
+    :return: True if it is running
+    :rtype: bool
+    """
+    if platform.system() == "Windows":
+        # os.kill() would terminate the process on Windows
+        import ctypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+
+        kernel32 = ctypes.windll.kernel32  # type: ignore
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == STILL_ACTIVE
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # running, as another user
+        return True
+
+    return True
+
+
+class RecordingSession:
+    """
+    A directory holding the files of one recording while it is made, with a `session.json` describing them.
+
+    The directory is removed once the recording has been turned into its final video. One that is still around after
+    the process that made it has died belongs to a recording that was interrupted, and can be recovered.
+    """
+
+    def __init__(self, path: str, info: dict) -> None:
+        """
+        :param str path: The directory of the session
+        :param dict info: What is known about the recording, saved in `session.json`
+        """
+        self.path = path
+        self.info = info
+
+    @staticmethod
+    def create(sessions_dir: str, **info) -> "RecordingSession":
+        """
+        Make the directory of a new recording, owned by the current process.
+
+        :param str sessions_dir: Where the sessions are kept
+        :param info: What is known about the recording so far
+        :return: The session
+        :rtype: RecordingSession
+        """
+        pid = os.getpid()
+        base_path = os.path.join(sessions_dir, f"{time.strftime('%Y%m%d%H%M%S')}_{pid}")
+        path = base_path
+        suffix = 1
+        while os.path.exists(path):
+            path = f"{base_path}-{suffix}"
+            suffix += 1
+        os.makedirs(path)
+
+        session = RecordingSession(
+            path, {"pid": pid, "created_at": time.time(), **info}
+        )
+        session.save()
+        return session
+
+    @staticmethod
+    def load(path: str) -> "RecordingSession":
+        """
+        :param str path: The directory of the session
+        :return: The session
+        :rtype: RecordingSession
+        :raises OSError: if `session.json` cannot be read
+        :raises ValueError: if `session.json` is corrupted
+        """
+        with open(os.path.join(path, SESSION_FILE)) as f:
+            return RecordingSession(path, json.load(f))
+
+    def file(self, name: str) -> str:
+        """
+        :param str name: The name of a file of the session
+        :return: The path of the file
+        :rtype: str
+        """
+        return os.path.join(self.path, name)
+
+    def update(self, **info) -> None:
+        self.info.update(info)
+        self.save()
+
+    def save(self) -> None:
+        # Written aside and then swapped, so a crash never leaves half a file behind
+        temp_file = self.file(SESSION_FILE + ".tmp")
+        with open(temp_file, "w") as f:
+            json.dump(self.info, f, indent=2)
+        os.replace(temp_file, self.file(SESSION_FILE))
+
+    def is_orphaned(self) -> bool:
+        """
+        Tell whether the process that made the recording is gone, leaving it unfinished.
+
+        :return: True if nobody else will finish the recording
+        :rtype: bool
+        """
+        pid = self.info.get("pid")
+        return not isinstance(pid, int) or (
+            pid != os.getpid() and not is_process_alive(pid)
+        )
+
+    def remove(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def find_orphaned_sessions(sessions_dir: str) -> List[RecordingSession]:
+    """
+    Find the recordings that were interrupted before they were finished.
+
+    :param str sessions_dir: Where the sessions are kept
+    :return: The orphaned sessions, oldest first
+    :rtype: List[RecordingSession]
+    """
+    if not os.path.isdir(sessions_dir):
+        return []
+
+    sessions = []
+    for name in sorted(os.listdir(sessions_dir)):
+        path = os.path.join(sessions_dir, name)
+        if not os.path.isdir(path):
+            continue
+
+        try:
+            session = RecordingSession.load(path)
+        except (OSError, ValueError):
+            # Died before the session was even described, there is nothing to recover
+            print(f"Removing unreadable recording session {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            continue
+
+        if session.is_orphaned():
+            sessions.append(session)
+
+    return sessions
@@ -0,0 +1,74 @@
+import json
+import os
+from typing import List
+
+TELEMETRY_FILE = "telemetry.jsonl"
+
+
+def sidecar_path(video_file: str) -> str:
+    """
+    :param str video_file: A video
+    :return: The path of the telemetry sidecar of the video
+    :rtype: str
+    """
+    return os.path.splitext(video_file)[0] + ".telemetry.json"
+
+
+class RecordingTelemetry:
+    """
+    How a recording went, sampled at regular intervals: frame rates, dropped frames, queue depth, encoder lag...
+
+    The samples are appended to a JSON Lines file as they are taken, so they survive a crash, and are turned into a
+    JSON sidecar of the final video at the end (see save_sidecar()).
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        :param str filename: The JSON Lines file the samples are appended to
+        """
+        self.filename = filename
+        self.latest: dict = {}
+
+    def record(self, sample: dict) -> None:
+        """
+        Add a sample.
+
+        :param dict sample: The figures of the recording at this point
+        :return: None
+        """
+        self.latest = sample
+        with open(self.filename, "a") as f:
+            f.write(json.dumps(sample) + "\n")
+
+    def samples(self) -> List[dict]:
+        """
+        :return: The samples recorded so far, oldest first. A line cut short by a crash is left out.
+        :rtype: List[dict]
+        """
+        if not os.path.isfile(self.filename):
+            return []
+
+        samples = []
+        with open(self.filename) as f:
+            for line in f:
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    break
+
+        return samples
+
+    def save_sidecar(self, video_file: str, info: dict) -> str:
+        """
+        Write the samples next to the video they describe.
+
+        :param str video_file: The final video
+        :param dict info: What is known about the recording as a whole (settings, totals...)
+        :return: The path of the sidecar
+        :rtype: str
+        """
+        path = sidecar_path(video_file)
+        with open(path, "w") as f:
+            json.dump({**info, "samples": self.samples()}, f, indent=2)
+
+        return path
@@ -1,24 +1,357 @@
 import os
 import ffmpeg
 import subprocess
+import numpy as np
+from typing import Callable
 
+from functionalities.encoder_profile import (
+    BALANCED_PROFILE,
+    REALTIME_PROFILE,
+    EncoderProfile,
+    encoder_threads,
+    to_args,
+)
+from functionalities.raw_matroska import frame_header, stream_header
 
-def process_video_and_audio_ffmpeg_raw_command(
+# Cores left to the capture, the UI and the audio while encoding during a recording
+STREAMING_RESERVED_CORES = 3
+
+
+class StreamingEncoder:
+    """
+    Long-lived ffmpeg process that encodes raw frames straight into the final video while recording, so there
+    is no intermediate file to decode and re-encode afterwards.
+
+    It has the same write/release interface as cv2.VideoWriter. MP4 files are fragmented, so whatever was written
+    before a crash is still playable.
+
+    It can also write a rolling ring of short Matroska segments instead of a single file. Every segment starts on a
+    keyframe, so the latest ones can be joined into a video without re-encoding (see concat_segments_ffmpeg_*).
+
+    Each frame is written with the tick it is shown at, and stays on screen until the next one (variable frame rate):
+    a frame that does not change is written once rather than once per tick, so a still screen costs next to nothing.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        width: int,
+        height: int,
+        fps: float,
+        pixel_format: str = "bgr24",
+        segment_time: float = 0.0,
+        segment_wrap: int = 0,
+        segment_list: str | None = None,
+        profile: EncoderProfile = REALTIME_PROFILE,
+    ) -> None:
+        """
+        Start the encoder.
+
+        :param str filename: The video file to write, or the pattern of the segment files (e.g. `segment_%03d.mkv`)
+        :param int width: The width of the frames
+        :param int height: The height of the frames
+        :param float fps: The frame rate the ticks of the frames are counted in
+        :param str pixel_format: The ffmpeg pixel format of the frames, see raw_matroska.FOURCCS
+        :param float segment_time: The duration of a segment in seconds, 0 to write a single file
+        :param int segment_wrap: How many segment files are kept before the oldest is overwritten, 0 to keep them all
+        :param segment_list: A CSV file listing the finished segments with their start and end time, newest last
+        :type segment_list: str or None
+        :param EncoderProfile profile: How the video is encoded, it must keep up with the frame rate
+        """
+        # The frames are sent with their timestamps, see raw_matroska
+        command = [
+            "ffmpeg",
+            "-y",
+            "-f",
+            "matroska",
+            "-probesize",
+            "32",  # the header says all there is to know, encoding starts with the first frame
+            "-i",
+            "pipe:0",
+            "-vf",
+            "pad=ceil(iw/2)*2:ceil(ih/2)*2",  # yuv420p needs even dimensions
+            "-fps_mode",
+            "vfr",  # frames are not repeated to fill the gaps between them
+            filename,
+        ]
+
+        video_options = profile.video_options(encoder_threads(STREAMING_RESERVED_CORES))
+        if segment_time == 0 and filename.endswith(".mp4"):
+            # A keyframe every 2 seconds, each starting a fragment: the file can be played at any moment and a crash
+            # loses 2 seconds at most
+            video_options["force_key_frames"] = "expr:gte(t,n_forced*2)"
+            command[-1:-1] = [
+                "-movflags",
+                "+frag_keyframe+empty_moov+default_base_moof",
+                "-flush_packets",
+                "1",  # or a quiet screen may sit in ffmpeg's buffer for a long time
+            ]
+        elif segment_time > 0:
+            # A keyframe at every cut, so any segment can be played on its own
+            video_options["force_key_frames"] = f"expr:gte(t,n_forced*{segment_time})"
+            command[-1:-1] = [
+                "-f",
+                "segment",
+                "-segment_time",
+                str(segment_time),
+                "-segment_wrap",
+                str(segment_wrap),
+                "-reset_timestamps",
+                "1",
+            ]
+            if segment_list is not None:
+                command[-1:-1] = [
+                    "-segment_list",
+                    segment_list,
+                    "-segment_list_type",
+                    "csv",
+                    "-segment_list_size",
+                    str(segment_wrap),
+                ]
+
+        command[-1:-1] = to_args(video_options)
+
+        self.filename = filename
+        self.__fps = fps
+        self.__next_tick = 0
+        self.__process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+        stdin = self.__process.stdin
+        assert stdin is not None
+        stdin.write(stream_header(width, height, fps, pixel_format))
+
+    def write(self, frame: np.ndarray, tick: int | None = None) -> None:
+        """
+        Encode a frame. The previous frame is shown until then.
+
+        :param np.ndarray frame: The frame, a contiguous array in the encoder's pixel format and size
+        :param tick: The frame interval it is shown from, after the one of the previous frame. The next one if None.
+        :type tick: int or None
+        :return: None
+        """
+        if tick is None:
+            tick = self.__next_tick
+        self.__next_tick = tick + 1
+
+        stdin = self.__process.stdin
+        assert stdin is not None
+        stdin.write(frame_header(round(tick * 1_000_000 / self.__fps), frame))
+        stdin.write(frame.data)
+
+    def release(self) -> None:
+        """
+        Finish the video and wait for ffmpeg to exit.
+
+        :return: None
+        :raises RuntimeError: if ffmpeg failed
+        """
+        stdin = self.__process.stdin
+        assert stdin is not None
+        stdin.close()
+
+        if self.__process.wait() != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with code {self.__process.returncode} while encoding {self.filename}"
+            )
+
+
+def __audio_input_options(audio_offset: float) -> dict:
+    """
+    Input options lining the audio up with the video.
+
+    :param float audio_offset: When the audio started, in seconds after the first video frame (negative if before)
+    :return: The ffmpeg input options for the audio file
+    :rtype: dict
+    """
+    if audio_offset >= 0:
+        return {"itsoffset": f"{audio_offset:.6f}"}  # delay the audio
+
+    return {"ss": f"{-audio_offset:.6f}"}  # skip what was recorded before the video
+
+
+def __audio_input_args(audio_file: str, audio_offset: float) -> list:
+    return to_args(__audio_input_options(audio_offset)) + ["-i", audio_file]
+
+
+def __wait_for_ffmpeg(
+    process: subprocess.Popen,
+    output_file: str,
+    on_progress: Callable[[float], None] | None,
+    is_cancelled: Callable[[], bool] | None,
+) -> None:
+    """
+    Follow an ffmpeg process started with `-progress pipe:1` until it exits.
+
+    :param subprocess.Popen process: The ffmpeg process, with its stdout piped
+    :param str output_file: The file ffmpeg writes, removed if the process is cancelled
+    :param on_progress: Called with how much of the output is written, in seconds
+    :type on_progress: Callable[[float], None] | None
+    :param is_cancelled: Polled on every progress report, ffmpeg is stopped once it returns True
+    :type is_cancelled: Callable[[], bool] | None
+    :return: None
+    :raises InterruptedError: if the process was cancelled
+    :raises subprocess.CalledProcessError: if ffmpeg failed
+    """
+    stdout = process.stdout
+    assert stdout is not None
+
+    # ffmpeg reports blocks of key=value lines about twice a second
+    for line in stdout:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        if key == "out_time_us" and value.isdigit() and on_progress is not None:
+            on_progress(int(value) / 1_000_000)
+
+        if is_cancelled is not None and is_cancelled():
+            process.terminate()
+            process.wait()
+            if os.path.isfile(output_file):
+                os.remove(output_file)
+            raise InterruptedError(f"Cancelled while writing {output_file}")
+
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+
+
+def __run_ffmpeg_raw_command(
+    command: list,
+    output_file: str,
+    on_progress: Callable[[float], None] | None,
+    is_cancelled: Callable[[], bool] | None,
+) -> None:
+    command = [command[0], "-progress", "pipe:1", *command[1:]]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    __wait_for_ffmpeg(process, output_file, on_progress, is_cancelled)
+
+
+def __run_ffmpeg_python(
+    stream,
+    output_file: str,
+    on_progress: Callable[[float], None] | None,
+    is_cancelled: Callable[[], bool] | None,
+) -> None:
+    process = (
+        stream.global_args("-progress", "pipe:1")
+        .overwrite_output()  # Equivalent to -y
+        .run_async(pipe_stdout=True)
+    )
+    __wait_for_ffmpeg(process, output_file, on_progress, is_cancelled)
+
+
+def mux_video_and_audio_ffmpeg_raw_command(
+    video_file: str,
+    audio_file: str,
+    output_file: str,
+    audio_offset: float = 0.0,
+    keep: bool = False,
+    on_progress: Callable[[float], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    profile: EncoderProfile = BALANCED_PROFILE,
+):
+    """Put an already encoded video and the audio into one file, only the audio is encoded (as the profile says)."""
+    if not os.path.isfile(video_file):
+        raise FileNotFoundError(f"Video file not found: {video_file}")
+
+    if not os.path.isfile(audio_file):
+        if keep:
+            __run_ffmpeg_raw_command(
+                ["ffmpeg", "-y", "-i", video_file, "-c", "copy", output_file],
+                output_file,
+                on_progress,
+                is_cancelled,
+            )
+        else:
+            os.replace(video_file, output_file)
+        return
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        video_file,
+        *__audio_input_args(audio_file, audio_offset),
+        "-map",
+        "0:v",
+        "-map",
+        "1:a",
+        "-c:v",
+        "copy",
+        *to_args(profile.audio_options()),
+        # Not -shortest: the still frames at the very end of a streamed video may not be stored, the audio lasts
+        # until the recording stopped and the last frame stays on screen meanwhile
+        output_file,
+    ]
+    __run_ffmpeg_raw_command(command, output_file, on_progress, is_cancelled)
+
+    if not keep:
+        os.remove(video_file)
+        os.remove(audio_file)
+
+
+def mux_video_and_audio_ffmpeg_python(
     video_file: str,
     audio_file: str,
     output_file: str,
-    expected_fps: float,
-    expected_duration: float,
+    audio_offset: float = 0.0,
     keep: bool = False,
+    on_progress: Callable[[float], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    profile: EncoderProfile = BALANCED_PROFILE,
 ):
+    """Put an already encoded video and the audio into one file, only the audio is encoded (as the profile says)."""
     if not os.path.isfile(video_file):
         raise FileNotFoundError(f"Video file not found: {video_file}")
 
-    """Merge video and audio using ffmpeg."""
-    video_duration = get_duration_ffmpeg_raw_command(video_file)
+    if not os.path.isfile(audio_file):
+        if keep:
+            __run_ffmpeg_python(
+                ffmpeg.input(video_file).output(output_file, c="copy"),
+                output_file,
+                on_progress,
+                is_cancelled,
+            )
+        else:
+            os.replace(video_file, output_file)
+        return
+
+    input_video = ffmpeg.input(video_file)
+    input_audio = ffmpeg.input(audio_file, **__audio_input_options(audio_offset))
+    __run_ffmpeg_python(
+        ffmpeg.output(
+            input_video.video,
+            input_audio.audio,
+            output_file,
+            vcodec="copy",
+            # Not shortest, see mux_video_and_audio_ffmpeg_raw_command()
+            **profile.audio_options(),
+        ),
+        output_file,
+        on_progress,
+        is_cancelled,
+    )
+
+    if not keep:
+        os.remove(video_file)
+        os.remove(audio_file)
+
+
+def process_video_and_audio_ffmpeg_raw_command(
+    video_file: str,
+    audio_file: str,
+    output_file: str,
+    audio_offset: float = 0.0,
+    keep: bool = False,
+    on_progress: Callable[[float], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    profile: EncoderProfile = BALANCED_PROFILE,
+):
+    """
+    Merge video and audio using ffmpeg, re-encoding the video with the profile.
 
-    actual_fps = expected_fps * (video_duration / expected_duration)
-    duration_ratio = expected_duration / video_duration
+    The recorder writes exactly one frame per frame interval, so the video already has the right duration and only
+    the start of the audio has to be lined up.
+    """
+    if not os.path.isfile(video_file):
+        raise FileNotFoundError(f"Video file not found: {video_file}")
 
     # Prepare the common part of the command
     command = [
@@ -26,26 +359,23 @@ def process_video_and_audio_ffmpeg_raw_command(
         "-y",
         "-i",
         video_file,
-        "-vf",
-        f"setpts={duration_ratio}*PTS",
-        "-r",
-        str(actual_fps),
-        "-c:v",
-        "libx264",
-        "-threads",
-        "16",
+        *to_args(profile.video_options()),
         "-shortest",
         output_file,
     ]
 
     # Add audio file if it exists
     if os.path.isfile(audio_file):
-        command.insert(4, "-i")
-        command.insert(5, audio_file)
-        command.insert(-2, "-c:a")
-        command.insert(-2, "aac")
+        command[4:4] = __audio_input_args(audio_file, audio_offset)
+        command[-2:-2] = [
+            "-map",
+            "0:v",
+            "-map",
+            "1:a",
+            *to_args(profile.audio_options()),
+        ]
 
-    subprocess.run(command, check=True)
+    __run_ffmpeg_raw_command(command, output_file, on_progress, is_cancelled)
 
     if not keep:
         os.remove(video_file)
@@ -57,36 +387,38 @@ def process_video_and_audio_ffmpeg_python(
     video_file: str,
     audio_file: str,
     output_file: str,
-    expected_fps: float,
-    expected_duration: float,
+    audio_offset: float = 0.0,
     keep: bool = False,
+    on_progress: Callable[[float], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    profile: EncoderProfile = BALANCED_PROFILE,
 ):
+    """
+    Merge video and audio using ffmpeg, re-encoding the video with the profile.
+
+    The recorder writes exactly one frame per frame interval, so the video already has the right duration and only
+    the start of the audio has to be lined up.
+    """
     if not os.path.isfile(video_file):
         raise FileNotFoundError(f"Video file not found: {video_file}")
 
-    """Merge video and audio using ffmpeg."""
-    video_duration = get_duration_ffmpeg_python(video_file)
-
-    actual_fps = expected_fps * (video_duration / expected_duration)
-    duration_ratio = expected_duration / video_duration
-
-    input = ffmpeg.input(video_file)
+    streams = [ffmpeg.input(video_file).video]
+    options = profile.video_options()
     if os.path.isfile(audio_file):
-        input_audio = ffmpeg.input(audio_file)
-        input = ffmpeg.concat(input, input_audio, v=1, a=1)
-
-    (
-        input.filter("setpts", f"{duration_ratio}*PTS")  # Apply the setpts filter
-        .filter("fps", fps=actual_fps)  # Set the output frame rate
-        .output(
-            vcodec="libx264",
-            acodec="aac",
+        input_audio = ffmpeg.input(audio_file, **__audio_input_options(audio_offset))
+        streams.append(input_audio.audio)
+        options.update(profile.audio_options())
+
+    __run_ffmpeg_python(
+        ffmpeg.output(
+            *streams,
+            output_file,
             shortest=None,
-            threads=16,
-            filename=output_file,
-        )
-        .overwrite_output()  # Equivalent to -y
-        .run()
+            **options,
+        ),
+        output_file,
+        on_progress,
+        is_cancelled,
     )
 
     if not keep:
@@ -95,30 +427,55 @@ def process_video_and_audio_ffmpeg_python(
             os.remove(audio_file)
 
 
-def get_duration_ffmpeg_raw_command(file: str) -> float:
-    """Get the duration of a video file."""
-    command = [
-        "ffprobe",
-        "-i",
-        file,
-        "-show_entries",
-        "format=duration",
-        "-v",
-        "quiet",
-        "-of",
-        "csv=p=0",
-    ]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return float(result.stdout)
+def __write_concat_list(segment_files: list, list_file: str) -> None:
+    with open(list_file, "w") as f:
+        for segment_file in segment_files:
+            # Single quotes are the only special character of the concat demuxer
+            escaped = os.path.abspath(segment_file).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
 
 
-def get_duration_ffmpeg_python(file: str) -> float:
-    """Get the duration of a video file."""
+def concat_segments_ffmpeg_raw_command(segment_files: list, output_file: str):
+    """Join video segments that start on a keyframe into one file, without re-encoding."""
+    if not segment_files:
+        raise FileNotFoundError("No segment to join")
+
+    list_file = output_file + ".txt"
+    __write_concat_list(segment_files, list_file)
+    try:
+        command = [
+            "ffmpeg",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_file,
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            output_file,
+        ]
+        subprocess.run(command, check=True)
+    finally:
+        os.remove(list_file)
+
+
+def concat_segments_ffmpeg_python(segment_files: list, output_file: str):
+    """Join video segments that start on a keyframe into one file, without re-encoding."""
+    if not segment_files:
+        raise FileNotFoundError("No segment to join")
+
+    list_file = output_file + ".txt"
+    __write_concat_list(segment_files, list_file)
     try:
-        probe = ffmpeg.probe(file)
-        duration = float(probe["format"]["duration"])
-        return duration
-    except KeyError:
-        raise ValueError("Could not retrieve duration from the file.")
-    except ffmpeg.Error as e:
-        raise RuntimeError(f"FFmpeg error: {e.stderr.decode('utf-8')}")
+        (
+            ffmpeg.input(list_file, f="concat", safe=0)
+            .output(output_file, c="copy", movflags="+faststart")
+            .overwrite_output()  # Equivalent to -y
+            .run()
+        )
+    finally:
+        os.remove(list_file)
@@ -1,5 +1,6 @@
 from multiprocessing import Process
 from multiprocessing.managers import SyncManager
+from multiprocessing.shared_memory import SharedMemory
 
 import os
 import signal
@@ -16,6 +17,11 @@ def kill_all_processes():
                 process.terminate()
         elif isinstance(process, SyncManager):
             process.shutdown()
+        elif isinstance(process, SharedMemory):  # memory shared with the processes
+            try:
+                process.unlink()
+            except Exception as e:
+                print(f"Error freeing shared memory {process.name}: {e}")
         elif isinstance(process, int):  # process is a pid
             try:
                 os.kill(process, signal.SIGTERM)
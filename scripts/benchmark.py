@@ -0,0 +1,184 @@
+"""
+Micro benchmarks for the hot paths of the app.
+
+Usage (from the repository root, inside the virtual environment):
+
+    python scripts/benchmark.py {overlay,mosaic,gaussian} [--repeat N]
+
+Benchmarks that grab the screen need a running X server.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(func: Callable[[], object], repeat: int) -> List[float]:
+    """
+    Run a function several times.
+
+    :param func: The function to measure
+    :param int repeat: How many times to run it
+    :return: The duration of each run, in milliseconds
+    :rtype: List[float]
+    """
+    func()  # warm up
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return durations
+
+
+def report(name: str, durations: List[float]) -> None:
+    print(
+        f"{name:<40} median {statistics.median(durations):8.2f} ms"
+        f"   min {min(durations):8.2f} ms   max {max(durations):8.2f} ms"
+    )
+
+
+def benchmark_overlay(repeat: int) -> None:
+    """Time from pressing New to the selection overlay being painted."""
+    from PIL import Image
+    from PyQt6.QtGui import QImage, QPixmap
+    from PyQt6.QtWidgets import QApplication
+    import mss
+
+    from components.capture import SnapshotOverlay
+    from components.utils import capture_all_screens_mss, set_normal_cursor
+
+    app = QApplication(sys.argv)
+
+    def capture_all_screens_pil() -> QPixmap:
+        # The capture path used before the screenshot buffer was wrapped directly
+        with mss.mss() as sct:
+            screenshot = sct.grab(sct.monitors[0])
+            img = Image.frombytes(
+                "RGB", screenshot.size, screenshot.bgra, "raw", "BGRX"
+            )
+            img = img.convert("RGBA")
+            qimage = QImage(
+                img.tobytes("raw", "RGBA"),
+                img.size[0],
+                img.size[1],
+                QImage.Format.Format_RGBA8888,
+            )
+            return QPixmap.fromImage(qimage)
+
+    def show_overlay() -> None:
+        overlay = SnapshotOverlay(lambda _: None)
+        overlay.repaint()
+        app.processEvents()
+        overlay.close()
+        set_normal_cursor()
+
+    report("capture (PIL, before)", measure(capture_all_screens_pil, repeat))
+    report("capture (wrapped BGRA)", measure(capture_all_screens_mss, repeat))
+    report("time to overlay", measure(show_overlay, repeat))
+
+
+def benchmark_mosaic(repeat: int) -> None:
+    """Time to mosaic selections of several sizes of a 4K capture."""
+    import cv2
+    import numpy as np
+
+    from functionalities import blur
+
+    apply_mosaic_effect = getattr(blur, "__apply_mosaic_effect")
+
+    def apply_mosaic_effect_loop(roi: np.ndarray) -> None:
+        # The mosaic used before the tiles were averaged all at once
+        h, w = roi.shape[:2]
+        tile_size = 20
+        for i in range(0, h, tile_size):
+            for j in range(0, w, tile_size):
+                tile = roi[i : i + tile_size, j : j + tile_size]
+                tile[:] = cv2.mean(tile)[:3]
+
+    image = np.random.default_rng(0).integers(0, 256, (2160, 3840, 3), np.uint8)
+    for width, height in ((200, 150), (1280, 720), (1920, 1080), (3840, 2160)):
+        report(
+            f"mosaic {width}x{height} (loop, before)",
+            measure(
+                lambda: apply_mosaic_effect_loop(image.copy()[:height, :width]),
+                repeat,
+            ),
+        )
+        report(
+            f"mosaic {width}x{height} (vectorized)",
+            measure(lambda: apply_mosaic_effect(image.copy()[:height, :width]), repeat),
+        )
+    report("copy of the capture (included above)", measure(image.copy, repeat))
+
+
+def benchmark_gaussian(repeat: int) -> None:
+    """Time to blur selections of several sizes of a 4K capture with a Gaussian."""
+    import cv2
+    import numpy as np
+    from PyQt6.QtCore import QRect
+    from PyQt6.QtGui import QImage
+
+    from functionalities.blur import (
+        DEFAULT_BLUR_RADIUS,
+        BlurMode,
+        BlurShape,
+        apply_blur_effect,
+    )
+    from functionalities.image_bridge import qimage_as_array
+
+    image = QImage(3840, 2160, QImage.Format.Format_RGB32)
+    pixels = qimage_as_array(image)
+    pixels[:] = np.random.default_rng(0).integers(0, 256, pixels.shape, np.uint8)
+
+    def gaussian_blur_full(rect: QRect) -> None:
+        # The prototype blurred the whole image, then kept the masked pixels
+        mask = np.zeros(pixels.shape[:2], dtype=np.uint8)
+        cv2.ellipse(
+            mask,
+            ((rect.center().x(), rect.center().y()), (rect.width(), rect.height()), 0),
+            255,
+            -1,
+        )
+        kernel_size = DEFAULT_BLUR_RADIUS * 2 + 1
+        blurred = cv2.GaussianBlur(pixels, (kernel_size, kernel_size), 0)
+        np.where(mask[:, :, np.newaxis] == 255, blurred, pixels)
+
+    for width, height in ((200, 150), (1280, 720), (3840, 2160)):
+        rect = QRect(0, 0, width, height)
+        report(
+            f"gaussian {width}x{height} (full image, before)",
+            measure(lambda: gaussian_blur_full(rect), repeat),
+        )
+        report(
+            f"gaussian {width}x{height} (region)",
+            measure(
+                lambda: apply_blur_effect(
+                    image.copy(), rect, BlurMode.GAUSSIAN, BlurShape.ELLIPSE
+                ),
+                repeat,
+            ),
+        )
+    report("copy of the capture (included above)", measure(image.copy, repeat))
+
+
+BENCHMARKS = {
+    "overlay": benchmark_overlay,
+    "mosaic": benchmark_mosaic,
+    "gaussian": benchmark_gaussian,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=BENCHMARKS.keys())
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.repeat)